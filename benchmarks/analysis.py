@@ -0,0 +1,769 @@
+import sys
+import json
+import math
+import toml
+import logging
+import argparse
+
+import numpy as np
+
+from pathlib import Path
+from functools import lru_cache
+
+from benchmarks.store import Store
+from benchmarks.table import ResultTable, SERIES_KEYS, load_results, load_store
+from benchmarks.utilities import setup_logger
+
+log = logging.getLogger()
+
+# largest number of elements in one block of resamples or comparisons
+BLOCK_SIZE: int = 2 ** 22
+
+# largest samples compared with the exact distribution of U
+EXACT_SIZE: int = 20
+
+def normal_sf(z: np.ndarray) -> np.ndarray:
+    """
+    Get the upper tail probability of the standard normal distribution
+
+    Uses the approximation of erfc from Abramowitz and Stegun (7.1.26),
+    which is accurate to about 1e-7.
+    """
+    x = np.abs(z) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * x)
+
+    poly = t * (0.254829592
+         + t * (-0.284496736
+         + t * (1.421413741
+         + t * (-1.453152027
+         + t * 1.061405429))))
+
+    tail = 0.5 * poly * np.exp(-x * x)
+    return np.where(z >= 0, tail, 1 - tail)
+
+def bootstrap_interval(values: np.ndarray, counts: np.ndarray, level: float = 0.95, resamples: int = 1000, seed: int = 0) -> tuple[np.ndarray,np.ndarray]:
+    """
+    Get bootstrap confidence intervals of the median of each row
+
+    'values' has one row per group, padded with NaN after the first
+    'counts' values. Each row is resampled with replacement and the
+    interval is taken from the percentiles of the resampled medians.
+    A fixed seed keeps the intervals the same between calls.
+    """
+    rng = np.random.default_rng(seed)
+    groups = len(values)
+
+    lower = np.full(groups, np.nan)
+    upper = np.full(groups, np.nan)
+
+    tail = (1 - level) / 2 * 100
+
+    # resample groups of the same size together, without padding
+    for size in np.unique(counts):
+        if size < 1:
+            continue
+
+        rows = np.flatnonzero(counts == size)
+
+        # resample a block of groups at a time to bound memory
+        step = max(1, BLOCK_SIZE // (resamples * size))
+
+        for start in range(0, len(rows), step):
+            block = rows[start:start + step]
+            picks = rng.integers(0, size, (len(block),resamples,size))
+
+            samples = np.take_along_axis(values[block,None,:size], picks, axis=2)
+            medians = np.median(samples, axis=2)
+
+            lower[block] = np.percentile(medians, tail, axis=1)
+            upper[block] = np.percentile(medians, 100 - tail, axis=1)
+
+    return (lower,upper)
+
+@lru_cache(maxsize=None)
+def u_counts(n1: int, n2: int) -> np.ndarray:
+    """Count the orderings of samples of n1 and n2 (without ties) that give each value of U"""
+    if n1 == 0 or n2 == 0:
+        return np.ones(1)
+
+    counts = np.zeros(n1 * n2 + 1)
+
+    # the largest value is either in the first sample (beating all of
+    # the second) or in the second
+    first = u_counts(n1 - 1, n2)
+    counts[n2:n2 + len(first)] += first
+
+    second = u_counts(n1, n2 - 1)
+    counts[:len(second)] += second
+
+    return counts
+
+def exact_p(u: float, n1: int, n2: int) -> float:
+    """Get the exact two-sided p-value of U for samples of n1 and n2 without ties"""
+    counts = u_counts(n1, n2)
+    total = counts.sum()
+
+    k = int(round(u))
+    lower = counts[:k + 1].sum() / total
+    upper = counts[k:].sum() / total
+
+    return min(2 * min(lower, upper), 1.0)
+
+def smallest_p(n1: np.ndarray, n2: np.ndarray) -> np.ndarray:
+    """Get the smallest two-sided p-value a Mann-Whitney U test can give for samples of n1 and n2"""
+    return np.array([ min(2 / math.comb(int(a + b), int(a)), 1.0) for a, b in zip(n1, n2) ])
+
+def mann_whitney(a: np.ndarray, a_counts: np.ndarray, b: np.ndarray, b_counts: np.ndarray) -> tuple[np.ndarray,np.ndarray]:
+    """
+    Compare each row of 'a' to the same row of 'b' with a Mann-Whitney U test
+
+    Rows are padded with NaN, as in 'bootstrap_interval'. Returns the U
+    statistic of 'a' and the two-sided p-value. The p-value is exact
+    for samples of up to EXACT_SIZE without ties, and otherwise comes
+    from the normal approximation with a continuity correction (without
+    a correction for ties).
+    """
+    pairs = len(a)
+    u = np.zeros(pairs)
+    ties = np.zeros(pairs)
+
+    # compare a block of pairs at a time to bound memory
+    step = max(1, BLOCK_SIZE // max(1, a.shape[1] * b.shape[1]))
+
+    for start in range(0, pairs, step):
+        block = slice(start, start + step)
+        left = a[block][:,:,None]
+        right = b[block][:,None,:]
+
+        # comparisons with NaN padding are always false
+        ties[block] = (left == right).sum(axis=(1,2))
+        u[block] = (left > right).sum(axis=(1,2)) + 0.5 * ties[block]
+
+    n1 = a_counts.astype(np.float64)
+    n2 = b_counts.astype(np.float64)
+
+    mean = n1 * n2 / 2
+    sd = np.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.maximum(np.abs(u - mean) - 0.5, 0) / sd
+
+    p = np.minimum(2 * normal_sf(z), 1)
+    p = np.where(sd > 0, p, 1.0)
+
+    # the normal approximation is poor for small samples
+    exact = (ties == 0) & (n1 > 0) & (n2 > 0) & (n1 <= EXACT_SIZE) & (n2 <= EXACT_SIZE)
+    for i in np.flatnonzero(exact):
+        p[i] = exact_p(u[i], int(n1[i]), int(n2[i]))
+
+    return (u,p)
+
+def summarize(table: ResultTable, value: str, level: float = 0.95, resamples: int = 1000, seed: int = 0, keys: list[str] = SERIES_KEYS) -> dict[str,np.ndarray]:
+    """
+    Get robust statistics of a column for each series in a table
+
+    Returns the series keys, count, mean, minimum, maximum, median, 5th
+    and 95th percentiles, and a bootstrap confidence interval of the
+    median ('lower' and 'upper'), with one row per series (or per
+    group of 'keys', if given).
+    """
+    groups, values, counts = table.matrix(keys, value)
+
+    if len(counts):
+        groups['mean'] = np.nanmean(values, axis=1)
+        groups['minimum'] = np.nanmin(values, axis=1)
+        groups['maximum'] = np.nanmax(values, axis=1)
+        groups['median'] = np.nanmedian(values, axis=1)
+        groups['p5'], groups['p95'] = np.nanpercentile(values, [5,95], axis=1)
+    else:
+        for name in ('mean','minimum','maximum','median','p5','p95'):
+            groups[name] = np.zeros(0)
+
+    groups['count'] = counts
+    groups['lower'], groups['upper'] = bootstrap_interval(values, counts, level, resamples, seed)
+    groups['values'] = values
+
+    return groups
+
+def compare(table: ResultTable, value: str = 'run_time', level: float = 0.95, resamples: int = 1000, seed: int = 0) -> list[dict]:
+    """
+    Compare every pair of programs run with the same benchmark and input
+
+    Each comparison gives the medians (with their bootstrap intervals)
+    of both programs, the ratio of the second median to the first, and
+    the Mann-Whitney U test of whether the two differ. Differences are
+    significant when the p-value is below 1 - 'level'. Only successful
+    runs are compared.
+    """
+    table = table.select(~table['failed'])
+
+    summary = summarize(table, value, level, resamples, seed)
+    values = summary.pop('values')
+
+    # find the pairs of series with the same benchmark and input
+    blocks = {}
+    for i, key in enumerate(zip(summary['benchmark'].tolist(),summary['input'].tolist())):
+        blocks.setdefault(key,[]).append(i)
+
+    pairs = [ (i,j) for rows in blocks.values() for n, i in enumerate(rows) for j in rows[n+1:] ]
+
+    if not pairs:
+        return []
+
+    first, second = np.array(pairs).T
+
+    u, p = mann_whitney(
+        values[first], summary['count'][first],
+        values[second], summary['count'][second])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = summary['median'][second] / summary['median'][first]
+
+    def program(i: int) -> dict:
+        return {
+            'language': str(summary['language'][i]),
+            'complexity': int(summary['complexity'][i]),
+            'threads': int(summary['threads'][i]),
+            'variant': str(summary['variant'][i]),
+            'toolchain': str(summary['toolchain'][i]),
+            'count': int(summary['count'][i]),
+            'median': float(summary['median'][i]),
+            'lower': float(summary['lower'][i]),
+            'upper': float(summary['upper'][i])
+        }
+
+    return [
+        {
+            'benchmark': str(summary['benchmark'][i]),
+            'input': float(summary['input'][i]),
+            'value': value,
+            'first': program(i),
+            'second': program(j),
+            'ratio': float(ratio[n]),
+            'u': float(u[n]),
+            'p': float(p[n]),
+            'significant': bool(p[n] < 1 - level)
+        }
+        for n, (i, j) in enumerate(pairs)
+    ]
+
+def diff(current: ResultTable, baseline: ResultTable, value: str = 'run_time', threshold: float = 0.05, level: float = 0.95) -> list[dict]:
+    """
+    Compare each series in 'baseline' to the same series in 'current'
+
+    Series are matched by benchmark, language, complexity, input,
+    threads, variant and toolchain, and their successful runs compared
+    with a Mann-Whitney U test. A series has 'regressed' if its median
+    grew by more than 'threshold' (relative to the baseline) and the
+    change is significant, or 'improved' if it shrank by as much. A
+    series that changed by as much is 'inconclusive' if it has too few
+    runs for any change to be significant at 'level'. Otherwise it is
+    'unchanged'. Baseline series that aren't in the
+    current suite are 'missing', and those without a successful run
+    (failed, timed out or with the wrong output) are 'failed'.
+    """
+    def keys(columns) -> list[tuple]:
+        return list(zip(*(columns[k].tolist() for k in SERIES_KEYS)))
+
+    # every series of the current suite, whether or not it succeeded
+    found = set(keys(current))
+
+    current = current.select(~current['failed'])
+    baseline = baseline.select(~baseline['failed'])
+
+    new_groups, new_values, new_counts = current.matrix(SERIES_KEYS, value)
+    old_groups, old_values, old_counts = baseline.matrix(SERIES_KEYS, value)
+
+    # match the series of both tables
+    index = { key: i for i, key in enumerate(keys(new_groups)) }
+    pairs = [ (index[key],i) for i, key in enumerate(keys(old_groups)) if key in index ]
+    lost = [ (i,key) for i, key in enumerate(keys(old_groups)) if key not in index ]
+
+    def series(groups: dict, i: int) -> dict:
+        return {
+            'benchmark': str(groups['benchmark'][i]),
+            'language': str(groups['language'][i]),
+            'complexity': int(groups['complexity'][i]),
+            'threads': int(groups['threads'][i]),
+            'variant': str(groups['variant'][i]),
+            'toolchain': str(groups['toolchain'][i]),
+            'input': float(groups['input'][i]),
+            'value': value
+        }
+
+    results = []
+
+    if pairs:
+        new, old = np.array(pairs).T
+
+        u, p = mann_whitney(
+            new_values[new], new_counts[new],
+            old_values[old], old_counts[old])
+
+        new_median = np.nanmedian(new_values[new], axis=1)
+        old_median = np.nanmedian(old_values[old], axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = new_median / old_median
+
+        significant = p < 1 - level
+        changed = (ratio > 1 + threshold) | (ratio < 1 - threshold)
+
+        # too few runs for the test to ever be significant
+        small = smallest_p(new_counts[new], old_counts[old]) >= 1 - level
+
+        status = np.where(significant & (ratio > 1 + threshold), 'regressed',
+                 np.where(significant & (ratio < 1 - threshold), 'improved',
+                 np.where(changed & small, 'inconclusive', 'unchanged')))
+
+        results.extend(
+            {
+                **series(old_groups, j),
+                'baseline': float(old_median[n]),
+                'current': float(new_median[n]),
+                'ratio': float(ratio[n]),
+                'u': float(u[n]),
+                'p': float(p[n]),
+                'status': str(status[n])
+            }
+            for n, (_, j) in enumerate(pairs)
+        )
+
+    # series that no longer run (or build), or only fail
+    for i, key in lost:
+        results.append({
+            **series(old_groups, i),
+            'baseline': float(np.nanmedian(old_values[i])),
+            'current': None,
+            'ratio': None,
+            'u': None,
+            'p': None,
+            'status': 'failed' if key in found else 'missing'
+        })
+
+    return results
+
+def scaling(table: ResultTable, value: str = 'run_time') -> list[dict]:
+    """
+    Get the speedup of each program and input across a scaling sweep
+
+    Medians are compared to the median with the fewest cores (usually
+    one). For each core count 'p' this gives the speedup 'S', parallel
+    efficiency 'S / p' and the Karp-Flatt serial fraction
+    '(1/S - 1/p) / (1 - 1/p)', relative to that baseline.
+    """
+    runs = table.select((table['threads'] > 0) & ~table['failed'])
+
+    groups, values, counts = runs.matrix(SERIES_KEYS, value)
+    medians = np.nanmedian(values, axis=1) if len(counts) else np.zeros(0)
+
+    # gather the medians of each program and input by core count
+    sweeps = {}
+    for i in range(len(counts)):
+        key = tuple(groups[k][i].item() for k in ('benchmark','complexity','language','variant','toolchain','input'))
+        sweeps.setdefault(key,{})[int(groups['threads'][i])] = float(medians[i])
+
+    results = []
+
+    for (benchmark, complexity, language, variant, toolchain, input), times in sweeps.items():
+        cores = sorted(times)
+
+        # the speedup is relative to the smallest sweep
+        base = cores[0]
+        scale = np.array(cores) / base
+        speedup = times[base] / np.array([ times[c] for c in cores ])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            serial = np.where(scale > 1, (1 / speedup - 1 / scale) / (1 - 1 / scale), np.nan)
+
+        results.append({
+            'benchmark': benchmark,
+            'language': language,
+            'complexity': complexity,
+            'variant': variant,
+            'toolchain': toolchain,
+            'input': input,
+            'value': value,
+            'threads': cores,
+            'medians': [ times[c] for c in cores ],
+            'speedup': speedup.tolist(),
+            'efficiency': (speedup / scale).tolist(),
+            'serial_fraction': [ None if np.isnan(v) else float(v) for v in serial ]
+        })
+
+    return results
+
+def builds(table: ResultTable, key: str, value: str = 'run_time', level: float = 0.95, resamples: int = 1000, seed: int = 0) -> list[dict]:
+    """
+    Compare the builds of each program and input to its default build
+
+    Builds are told apart by 'key' (as in 'variant' or 'toolchain'),
+    and the default build is the one where it's ''. Builds that differ
+    in any other way (sweeps, and the other build keys) are left out.
+    Each build has its median (with its bootstrap interval), its
+    speedup over the default build (the ratio of the default median
+    to its own) and the Mann-Whitney p-value of the difference.
+    """
+    others = [ k for k in ('variant','toolchain') if k != key ]
+
+    mask = (table['threads'] == 0) & ~table['failed']
+    for other in others:
+        mask &= table[other] == ''
+
+    runs = table.select(mask)
+
+    summary = summarize(runs, value, level, resamples, seed)
+    values = summary.pop('values')
+
+    # gather the builds of each program and input
+    programs = {}
+    for i in range(len(summary['count'])):
+        program = tuple(summary[k][i].item() for k in ('benchmark','complexity','language','input'))
+        programs.setdefault(program,{})[str(summary[key][i])] = i
+
+    # compare every build to the default build of its program
+    pairs = [
+        (rows[''],j) for rows in programs.values() if '' in rows
+        for name, j in rows.items() if name
+    ]
+
+    if not pairs:
+        return []
+
+    first, second = np.array(pairs).T
+
+    _, p = mann_whitney(
+        values[first], summary['count'][first],
+        values[second], summary['count'][second])
+
+    tests = { int(j): float(p[n]) for n, j in enumerate(second) }
+
+    results = []
+
+    for (benchmark, complexity, language, input), rows in programs.items():
+        if '' not in rows or len(rows) < 2:
+            continue
+
+        default = float(summary['median'][rows['']])
+
+        results.append({
+            'benchmark': benchmark,
+            'language': language,
+            'complexity': complexity,
+            'input': input,
+            'value': value,
+            'default': default,
+            'builds': {
+                name: {
+                    'count': int(summary['count'][i]),
+                    'median': float(summary['median'][i]),
+                    'lower': float(summary['lower'][i]),
+                    'upper': float(summary['upper'][i]),
+                    'speedup': default / float(summary['median'][i]),
+                    'p': tests.get(i)
+                }
+                for name, i in rows.items()
+            }
+        })
+
+    return results
+
+def variants(table: ResultTable, value: str = 'run_time', level: float = 0.95, resamples: int = 1000, seed: int = 0) -> list[dict]:
+    """
+    Compare the flag variants of each program and input to its default build
+
+    Gives the builds of each variant (see 'builds'), and the 'fastest'
+    one (with the lowest median, or '' for the default build) with its
+    'speedup'.
+    """
+    results = []
+
+    for item in builds(table, 'variant', value, level, resamples, seed):
+        found = item.pop('builds')
+        fastest = min(found, key=lambda v: found[v]['median'])
+
+        results.append({
+            **item,
+            'variants': found,
+            'fastest': fastest,
+            'speedup': found[fastest]['speedup']
+        })
+
+    return results
+
+def toolchains(table: ResultTable, value: str = 'run_time', level: float = 0.95, resamples: int = 1000, seed: int = 0) -> list[dict]:
+    """
+    Compare the toolchains of each program and input to its default build
+
+    Gives the builds of each toolchain (see 'builds'), with the
+    compiler version of each and the relative 'change' of its median
+    from the default build (so 0.05 is 5% slower). A toolchain is
+    'significant' when the p-value is below 1 - 'level'.
+    """
+    # the compiler version of each toolchain of a language
+    versions = {
+        (str(l), str(t)): str(v)
+        for l, t, v in zip(table['language'], table['toolchain'], table['compiler_version'])
+    }
+
+    results = []
+
+    for item in builds(table, 'toolchain', value, level, resamples, seed):
+        found = item.pop('builds')
+
+        for name, build in found.items():
+            build['version'] = versions.get((item['language'],name),'')
+            build['change'] = build['median'] / item['default'] - 1
+            build['significant'] = bool(build['p'] is not None and build['p'] < 1 - level)
+
+        results.append({ **item, 'toolchains': found })
+
+    return results
+
+def describe(name: str, item: dict) -> str:
+    """
+    Label a program in a printout, as in 'nbody-1.c~gcc-11@O1 (4 cores)'
+
+    The toolchain and variant are added as in Program.label, and the
+    cores of a scaling sweep after them.
+    """
+    if item.get('toolchain'):
+        name += f"~{item['toolchain']}"
+    if item.get('variant'):
+        name += f"@{item['variant']}"
+    if item.get('threads'):
+        name += f" ({item['threads']} cores)"
+    return name
+
+def parse_threshold(text: str) -> float:
+    """Parse a threshold given as a fraction ('0.05') or a percentage ('5%')"""
+    text = text.strip()
+    if text.endswith('%'):
+        return float(text[:-1]) / 100
+    return float(text)
+
+def analysis_settings(config: dict) -> tuple[float,int,int]:
+    """Get the confidence level, resample count and seed under 'analysis'"""
+    analysis = config.get('analysis',{})
+    level = float(analysis.get('level','0.95'))
+    resamples = int(analysis.get('resamples','1000'))
+    seed = int(analysis.get('seed','0'))
+    return (level,resamples,seed)
+
+def load_table(database: Path, results: Path, suite: str | None = None) -> ResultTable:
+    """
+    Load a suite from the database, or the result files if there's no database
+
+    If 'suite' is the path of a directory, the result files in it
+    are loaded instead. An empty database counts as no database.
+    """
+    if suite and Path(suite).is_dir():
+        return load_results(suite)
+
+    if database.exists():
+        store = Store(database)
+        latest = store.latest_suite()
+
+        if suite or latest is not None:
+            table = load_store(store,suite=int(suite or latest))
+            store.close()
+            return table
+
+        store.close()
+        log.info(f"No suites in {database}, loading the result files instead")
+
+    return load_results(results)
+
+def run():
+    # define and parse command line arguments
+    parser = argparse.ArgumentParser(
+        prog='Compare',
+        description='Compare the results of programs with the same benchmark and input',
+        epilog='Leave an issue on the repo if you have trouble')
+
+    parser.add_argument('-c','--config',
+        dest='config',
+        action='store',
+        default='benchmarks.toml',
+        help='Path to a toml config file')
+
+    parser.add_argument('-d','--database',
+        dest='database',
+        action='store',
+        default='output/results.db',
+        help='Path to the results database')
+
+    parser.add_argument('-s','--suite',
+        dest='suite',
+        action='store',
+        default=None,
+        help='The suite to compare (defaults to the latest)')
+
+    parser.add_argument('-m','--metric',
+        dest='metric',
+        action='store',
+        default='run_time',
+        help='The run field to compare (run_time, corrected_run_time, total_cpu_time or max_rss)')
+
+    parser.add_argument('-o','--output',
+        dest='output',
+        action='store',
+        default=None,
+        help='Path to write the comparisons to')
+
+    parser.add_argument('-b','--baseline',
+        dest='baseline',
+        action='store',
+        default=None,
+        help='A suite (or results directory) to compare the suite against')
+
+    parser.add_argument('-t','--threshold',
+        dest='threshold',
+        action='store',
+        default='5%',
+        help='The change from the baseline that counts as a regression')
+
+    parser.add_argument('--scaling',
+        dest='scaling',
+        action='store_true',
+        help='Report the speedup of each program in a scaling sweep')
+
+    parser.add_argument('--variants',
+        dest='variants',
+        action='store_true',
+        help='Report the fastest flag variant of each program')
+
+    parser.add_argument('--toolchains',
+        dest='toolchains',
+        action='store_true',
+        help='Report the change of each program with each toolchain')
+
+    parser.add_argument('-f','--logfile',
+        dest='logfile',
+        action='store',
+        default=None,
+        help='Path to a log file')
+
+    parser.add_argument('-l','--loglevel',
+        dest='loglevel',
+        action='store',
+        default='warn',
+        help='The level to log at')
+
+    args = vars(parser.parse_args())
+
+    # initialize the logger for the application
+    log = setup_logger(args['loglevel'].upper(),args['logfile'])
+
+    # get the benchmark configuration file
+    with open(args['config'], 'r') as f:
+        config = toml.loads(f.read(), _dict=dict)
+
+    level, resamples, seed = analysis_settings(config)
+
+    database = Path(args['database'])
+    results = Path('output/results')
+
+    table = load_table(database,results,args['suite'])
+    table = table.select(table['kind'] == 'run')
+
+    # compare the suite to a baseline suite
+    if args['baseline']:
+        baseline = load_table(database,results,args['baseline'])
+        baseline = baseline.select(baseline['kind'] == 'run')
+
+        threshold = parse_threshold(args['threshold'])
+
+        changes = []
+        for metric in ('run_time','max_rss'):
+            changes.extend(diff(table,baseline,metric,threshold,level))
+
+        with open(args['output'] or 'output/regressions.json','w') as f:
+            json.dump(changes, f, indent=4)
+
+        for item in changes:
+            if item['status'] == 'unchanged':
+                continue
+            program = describe(f"{item['benchmark']}-{item['complexity']}.{item['language']}",item)
+
+            # missing and failed series have nothing to compare
+            if item['ratio'] is None:
+                print(f"{item['status']}\t{program}\t{item['input']}\t{item['value']}")
+                continue
+
+            change = (item['ratio'] - 1) * 100
+            print(f"{item['status']}\t{program}\t{item['input']}\t{item['value']}\t{change:+.1f}%\t{item['p']:.4f}")
+
+        regressions = [ c for c in changes if c['status'] == 'regressed' ]
+        broken = [ c for c in changes if c['status'] in ('missing','failed') ]
+        inconclusive = [ c for c in changes if c['status'] == 'inconclusive' ]
+        log.info(f"Compared {len(changes)} series, {len(regressions)} regressed, {len(broken)} missing or failed")
+
+        if inconclusive:
+            log.warning(f"{len(inconclusive)} series changed but have too few runs to tell if it's significant")
+
+        # fail if anything got slower or bigger, or stopped working
+        if regressions or broken:
+            sys.exit(1)
+
+        return
+
+    # report the speedups of a scaling sweep
+    if args['scaling']:
+        sweeps = scaling(table,args['metric'])
+
+        with open(args['output'] or 'output/scaling.json','w') as f:
+            json.dump(sweeps, f, indent=4)
+
+        for item in sweeps:
+            program = describe(f"{item['benchmark']}-{item['complexity']}.{item['language']}",{ **item, 'threads': None })
+            for p, s, e, f in zip(item['threads'],item['speedup'],item['efficiency'],item['serial_fraction']):
+                serial = '' if f is None else f'{f:.3f}'
+                print(f"{program}\t{item['input']}\t{p}\t{s:.2f}\t{e:.2f}\t{serial}")
+
+        return
+
+    # report the fastest flag variant of each program
+    if args['variants']:
+        builds = variants(table,args['metric'],level,resamples,seed)
+
+        with open(args['output'] or 'output/variants.json','w') as f:
+            json.dump(builds, f, indent=4)
+
+        for item in builds:
+            program = f"{item['benchmark']}-{item['complexity']}.{item['language']}"
+            fastest = item['fastest'] or 'default'
+            p = item['variants'][item['fastest']]['p']
+            test = '' if p is None else f'{p:.4f}'
+            print(f"{program}\t{item['input']}\t{fastest}\t{item['speedup']:.3f}\t{test}")
+
+        return
+
+    # report the change of each toolchain from the default one
+    if args['toolchains']:
+        changes = toolchains(table,args['metric'],level,resamples,seed)
+
+        with open(args['output'] or 'output/toolchains.json','w') as f:
+            json.dump(changes, f, indent=4)
+
+        for item in changes:
+            program = f"{item['benchmark']}-{item['complexity']}.{item['language']}"
+            for name, build in item['toolchains'].items():
+                if not name:
+                    continue
+                flag = '*' if build['significant'] else ''
+                print(f"{program}\t{item['input']}\t{name}\t{build['version']}\t{build['change'] * 100:+.1f}%\t{build['p']:.4f}{flag}")
+
+        return
+
+    comparisons = compare(table,args['metric'],level,resamples,seed)
+    log.info(f"Made {len(comparisons)} comparisons")
+
+    with open(args['output'] or 'output/comparison.json','w') as f:
+        json.dump(comparisons, f, indent=4)
+
+    for item in comparisons:
+        first = describe(f"{item['first']['language']}-{item['first']['complexity']}",item['first'])
+        second = describe(f"{item['second']['language']}-{item['second']['complexity']}",item['second'])
+        flag = '*' if item['significant'] else ''
+        print(f"{item['benchmark']}\t{item['input']}\t{first}\t{second}\t{item['ratio']:.3f}\t{item['p']:.4f}{flag}")
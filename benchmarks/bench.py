@@ -1,20 +1,63 @@
+import os
 import toml
+import shlex
+import shutil
 import argparse
-import json
+import logging
+import functools
 
 from pathlib import Path
+from typing import Iterable
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 from benchmarks.program import Program
+from benchmarks.cache import BuildCache
+from benchmarks.schedule import Job, run_jobs, run_pinned, scheduling_cores, scheduling_width
+from benchmarks.journal import Journal, index_journal, journal_suite, load_series, load_journal, load_progress, load_runs
 from benchmarks.result import SeriesResult, SummaryResult
-from benchmarks.utilities import setup_logger
+from benchmarks.store import Store
+from benchmarks.plan import Planner, load_estimates, print_plan
+from benchmarks.models import load_models
+from benchmarks.checksums import record_checksums
+from benchmarks.calibrate import calibrate, save_calibration, load_calibration, startup_times
+from benchmarks.utilities import setup_logger, write_collated
+
+log = logging.getLogger()
+
+def find_toolchains(config: dict) -> dict[str,list[str]]:
+    """
+    Find the extra build tools of each language that are installed
+
+    Tools are listed by language under 'toolchains', and may have
+    arguments (as in 'rustc +nightly'). Tools that can't be found
+    are skipped, as is the default tool under 'tools'.
+    """
+    tools = config.get('tools',{})
+    toolchains = {}
+
+    for language, commands in config.get('toolchains',{}).items():
+        for command in commands:
+            if command == tools.get(language):
+                continue
+
+            if not shutil.which(shlex.split(command)[0]):
+                log.info(f"Skipping toolchain \"{command}\" for {language}, it isn't installed")
+                continue
+
+            toolchains.setdefault(language,[]).append(command)
+
+    return toolchains
 
 def find_programs(config: dict) -> list[Program]:
     """
     Find all the programs specified in the config
 
     This function finds programs using the attributes
-    listed under 'filters' ('include', 'exclude' etc.)
+    listed under 'filters' ('include', 'exclude' etc.),
+    and adds a copy of each for the flag variants of its
+    language (under 'variants') and for each installed
+    toolchain (under 'toolchains').
     """
     filters = config.get('filters',{})
     initial = filters.get('directories',[])
@@ -48,7 +91,44 @@ def find_programs(config: dict) -> list[Program]:
             tmp.append(path)
     result = tmp
 
-    return [ Program(p) for p in result ]
+    variants = config.get('variants',{})
+    toolchains = find_toolchains(config)
+    programs = []
+
+    for path in result:
+        language = path.suffix.lstrip('.')
+
+        # build with the default tool and every other toolchain
+        for toolchain in [None] + toolchains.get(language,[]):
+            programs.append(Program(path,None,toolchain))
+
+            # add a program for each flag variant of the language
+            for variant in variants.get(language,{}):
+                programs.append(Program(path,variant,toolchain))
+
+    return programs
+
+def build_programs(programs: list[Program], config: dict, jobs: int = 1, cache: BuildCache | None = None) -> list[Program]:
+    """
+    Build all programs ahead of the benchmark runs
+
+    Every program is built in a private directory with its
+    own environment, so up to 'jobs' builds run at once.
+    """
+    def build(program: Program) -> Program:
+        program.build(config,cache)
+
+        # report the build output if it failed
+        if not program.built():
+            stdout, stderr = program.output()
+            log.warning(f"Failed to build {program.label()}:\n{stdout}\n{stderr}")
+
+        return program
+
+    with ThreadPoolExecutor(max_workers=max(jobs,1)) as pool:
+        built = list(pool.map(build,programs))
+
+    return [ p for p in built if p.built() ]
 
 def save_results_individual(results: list[SeriesResult], path: Path):
     for result in results:
@@ -65,40 +145,68 @@ def save_results_individual(results: list[SeriesResult], path: Path):
         with open(filepath,'w') as f:
             f.write(data)
 
-def save_results_collated(results: list[SeriesResult], path: Path):
+def resume_jobs(jobs: list[Job], progress: dict) -> list[Job]:
+    """
+    Remove jobs that finished in an earlier run
+
+    A job is only skipped if its series finished with the same
+    build of the program. Unfinished series are kept and resume
+    from their completed runs, and stale series start over.
+    """
+    result = []
+
+    for job in jobs:
+        key = (job.program.name(),float(job.input),job.threads,job.program.variant,job.program.toolchain)
+        entry = progress.get(key)
+
+        # remove any progress for an old build
+        if entry and entry['build'] != job.program.build_hash:
+            del progress[key]
+            entry = None
+
+        if entry and entry['finished']:
+            continue
+
+        result.append(job)
+
+    log.info(f"Resuming {len(result)} of {len(jobs)} series")
+    return result
+
+def save_results_collated(journal: Path, path: Path):
+    """
+    Collate the series in a journal into one file per benchmark
+
+    Series are read from the journal and written out one at a
+    time, so the whole dataset is never held in memory at once.
+    """
     benchmarks = {}
 
-    for result in results:
-        complexity = result.complexity
-        bench = result.bench_name() 
-        input = result.input
-        data = result.dict()
+    for (bench, input, *_), offsets in index_journal(journal).items():
+        # split names like 'nbody-2.rust' into 'nbody' and '2'
+        name = bench.split('-')[0]
+        complexity = bench.split('-')[1].split('.')[0]
 
-        if bench not in benchmarks:
-            benchmarks[bench] = {}
+        if name not in benchmarks:
+            benchmarks[name] = {}
 
-        if input not in benchmarks[bench]:
-            benchmarks[bench][input] = {}
+        if input not in benchmarks[name]:
+            benchmarks[name][input] = {}
 
-        if complexity not in benchmarks[bench][input]:
-            benchmarks[bench][input][complexity] = []
+        if complexity not in benchmarks[name][input]:
+            benchmarks[name][input][complexity] = []
 
-        benchmarks[bench][input][complexity].append(data)
+        # load the series only when it's written
+        loader = functools.partial(load_series,journal,offsets)
+        benchmarks[name][input][complexity].append(loader)
 
     for bench, inputs in benchmarks.items():
 
         filepath = path / f"{bench}.json"
 
-        data = json.dumps({
-            'name': bench,
-            'inputs': inputs
-        },indent=4)
-
-        # write the json to the output file
-        with open(filepath,'w') as f:
-            f.write(data)
+        # write the json to the output file as it's loaded
+        write_collated(filepath,bench,inputs)
 
-def save_summary(result: list[SeriesResult], path: Path):
+def save_summary(result: Iterable[SeriesResult], path: Path):
     # summarize the benchmarks
     summary = SummaryResult(datetime=datetime.utcnow())
     summary.build(result)
@@ -140,6 +248,55 @@ def run():
         default='warn',
         help='The level to log at')
 
+    parser.add_argument('-j','--jobs', 
+        dest='jobs', 
+        action='store',
+        default=os.cpu_count(),
+        help='Number of programs to build at once')
+
+    parser.add_argument('--no-cache', 
+        dest='cache', 
+        action='store_false',
+        help='Rebuild all programs without the build cache')
+
+    parser.add_argument('--resume', 
+        dest='resume', 
+        action='store_true',
+        help='Skip runs already in the journal for unchanged builds')
+
+    parser.add_argument('-d','--database', 
+        dest='database', 
+        action='store',
+        default=None,
+        help='Path to the results database (defaults to results.db in the output directory)')
+
+    parser.add_argument('--budget', 
+        dest='budget', 
+        action='store',
+        default=None,
+        help='Seconds to spend on runs, deferring series that won\'t finish in time')
+
+    parser.add_argument('--record-checksums', 
+        dest='record', 
+        action='store_true',
+        help='Save the output hashes of this run as the reference checksums')
+
+    parser.add_argument('--scaling', 
+        dest='scaling', 
+        action='store',
+        default=None,
+        help='Comma-separated core counts to run each series with (as in 1,2,4,8)')
+
+    parser.add_argument('--calibrate', 
+        dest='calibrate', 
+        action='store_true',
+        help='Measure the startup time of each language before running')
+
+    parser.add_argument('--plan', 
+        dest='plan', 
+        action='store_true',
+        help='Print the planned series and their predicted times without running them')
+
     args = vars(parser.parse_args())
 
     # get the benchmark configuration file
@@ -162,44 +319,182 @@ def run():
     general = config.get('general',{})
     values  = config.get('values',{})
     runs    = int(general.get('runs','1'))
-    timeout = int(general.get('timeout','3600'))
+    jobs    = int(args['jobs'])
+
+    scheduling = config.get('scheduling',{})
+
+    # get the build cache settings
+    caching = config.get('cache',{})
+    cache   = None
+
+    if args['cache'] and caching.get('enabled',True):
+        cache = BuildCache(
+            caching.get('path','data/cache'),
+            int(caching.get('size','2048')) * 1024 * 1024)
 
     # build paths to the result directories
     output_path = Path(args['output'])
     result_path = output_path / 'results'
     summary_path = output_path / 'summary.json'
+    journal_path = output_path / 'journal.jsonl'
+    database_path = Path(args['database'] or output_path / 'results.db')
 
     # create directories if they don't exist
     output_path.mkdir(exist_ok=True)
     result_path.mkdir(exist_ok=True)
 
-    results = []
+    # build all programs before running any of them
+    if not args['plan']:
+        log.info(f"Building {len(programs)} programs ({jobs} jobs)")
+        programs = build_programs(programs,config,jobs,cache)
+
+    # only hash the builds to plan, so resumed series are found
+    else:
+        for program in programs:
+            program.build_hash = program.fingerprint(config)
+
+    # measure the startup time of each language, or reuse the last one
+    calibration_path = output_path / 'calibration.json'
 
-    # for each program, build and run the benchmark
+    if not args['plan'] and (args['calibrate'] or config.get('calibration',{}).get('enabled',False)):
+        log.info("Calibrating startup times")
+        baselines = calibrate(config,{ p.language() for p in programs },cache)
+        save_calibration(calibration_path,baselines)
+
+    startup = startup_times(load_calibration(calibration_path))
+
+    series_jobs = []
+
+    # get the core counts of a scaling sweep, if any
+    sweep = [ int(v) for v in args['scaling'].split(',') ] if args['scaling'] else []
+
+    if sweep:
+        cores = scheduling_cores(config)[1] if scheduling.get('enabled',False) else os.sched_getaffinity(0)
+        skipped = [ c for c in sweep if c > len(cores) ]
+        sweep = [ c for c in sweep if c <= len(cores) ]
+
+        if skipped:
+            log.warning(f"Skipping core counts {skipped}, only {len(cores)} cores are available")
+
+    # for each program, get a series for each of the inputs
     for program in programs:
 
         # get input values, if any
         target = program.target()
         inputs = values.get(target,[])
 
-        # build the program in the tmp directory
-        program.build(config)
-
-        # run the program for each of the inputs
         for input in inputs:
-            
-            # get the series results
-            result = program.series(
-                config,
-                input,
-                runs,
-                timeout
-            )
-
-            if result:
-                results.append(result)
+            # run the series once for each core count in a sweep
+            if sweep:
+                series_jobs.extend([ Job(program,input,c,c) for c in sweep ])
             else:
-                log.warn(f"No result for {program.name()} (input={input})")
-
-    save_results_collated(results,result_path)
-    save_summary(results,summary_path)
\ No newline at end of file
+                width = scheduling_width(config,program)
+                series_jobs.append(Job(program,input,width))
+
+    progress = {}
+
+    # find the runs that are already done
+    if args['resume'] and journal_path.exists():
+        progress = load_progress(journal_path)
+        series_jobs = resume_jobs(series_jobs,progress)
+
+    # predict run times from earlier suites and the fitted models
+    budget = float(args['budget']) if args['budget'] else None
+    planner = Planner(
+        config,
+        load_estimates(database_path),
+        load_models(output_path / 'models.json'),
+        budget)
+
+    concurrent = scheduling.get('enabled',False)
+
+    # run the longest series first when running side by side
+    if concurrent:
+        series_jobs = planner.order(series_jobs)
+
+    slots = planner.schedule(series_jobs,concurrent)
+
+    if args['plan']:
+        print_plan(slots)
+        return
+
+    # defer the series that won't fit in the budget
+    deferred = [ s for s in slots if s.deferred ]
+    if deferred:
+        log.warning(f"Deferring {len(deferred)} series that won't finish within {budget}s (run again with --resume)")
+        series_jobs = [ s.job for s in slots if not s.deferred ]
+
+    # log every run to the journal as it finishes
+    journal = Journal(journal_path,truncate=not args['resume'])
+
+    def run_series(job: Job, cores: list[int] = []):
+        program = job.program
+
+        # skip series that can no longer finish in time
+        if not planner.fits(job):
+            log.warning(f"Deferring {program.label()} (input={job.input}), not enough budget left")
+            return
+
+        # get the runs done before, if resuming
+        key = (program.name(),float(job.input),job.threads,program.variant,program.toolchain)
+        previous = []
+
+        if key in progress:
+            offsets = progress[key]['runs'].values()
+            previous = load_runs(journal_path,sorted(offsets))
+
+        # get the series results
+        result = program.series(
+            config,
+            job.input,
+            runs,
+            planner.timeout(job),
+            journal,
+            previous,
+            job.threads,
+            startup.get(program.language()),
+            cores or None
+        )
+
+        if not result or not result.count():
+            log.warning(f"No result for {program.label()} (input={job.input})")
+
+        # improve the predictions for the larger inputs
+        planner.record(result)
+
+    try:
+        # run series side by side on separate cores if enabled
+        if concurrent:
+            run_jobs(config,series_jobs,run_series)
+        else:
+            for job in series_jobs:
+                if job.threads:
+                    run_pinned(job,run_series)
+                else:
+                    run_series(job)
+    finally:
+        journal.close()
+
+    # collate the journal into the result files
+    save_results_collated(journal_path,result_path)
+    save_summary(load_journal(journal_path),summary_path)
+
+    # save the output hashes as the new references
+    if args['record']:
+        checksums_path = Path(config.get('checksums',{}).get('path','data/checksums.toml'))
+        count = record_checksums(checksums_path,load_journal(journal_path),overwrite=True)
+        log.info(f"Recorded {count} checksums in {checksums_path}")
+
+    # add the results to the database as a new suite, or in place
+    # of the suite the journal was saved as before it was resumed
+    store = Store(database_path)
+    saved = journal_suite(journal_path,database_path)
+    suite = store.import_series(load_journal(journal_path),datetime.utcnow(),args['config'],saved)
+    store.close()
+
+    # remember the suite, for when the journal is resumed
+    journal = Journal(journal_path,truncate=False)
+    journal.record_suite(suite,database_path)
+    journal.close()
+
+    log.info(f"Saved results as suite {suite} in {database_path}")
\ No newline at end of file
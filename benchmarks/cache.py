@@ -0,0 +1,141 @@
+import os
+import json
+import shlex
+import shutil
+import hashlib
+import logging
+import subprocess
+import threading
+
+from pathlib import Path
+from functools import lru_cache
+
+log = logging.getLogger()
+
+# file in each entry with the metrics of the original build
+METADATA: str = 'build.json'
+
+@lru_cache(maxsize=None)
+def tool_version(tool: str) -> str:
+    """Get the version string of a build tool (which may have arguments), if available"""
+    try:
+        result = subprocess.run(
+            [*shlex.split(tool),'--version'],
+            capture_output=True,
+            text=True)
+        return result.stdout.strip() or result.stderr.strip()
+    except OSError:
+        return ''
+
+def file_digest(path: Path) -> str:
+    """Get the SHA-256 of a file, hashing it again only once it changes"""
+    stat = path.stat()
+    return hash_file(str(path),stat.st_mtime_ns,stat.st_size)
+
+@lru_cache(maxsize=None)
+def hash_file(path: str, mtime: int, size: int) -> str:
+    """Hash a file (the modification time and size only key the cache)"""
+    digest = hashlib.sha256()
+    with open(path,'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class BuildCache:
+    """
+    A content-addressed store of build artifacts
+
+    Each entry is a directory named after the build key. Entries
+    are touched when they are used and the least recently used
+    entries are evicted when the cache grows beyond 'size' bytes.
+    """
+
+    def __init__(self, path: Path | str, size: int):
+        self.path = Path(path)
+        self.size = size
+        self.lock = threading.Lock()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def entry(self, key: str) -> Path:
+        return self.path / key
+
+    def fetch(self, key: str, target: Path) -> bool:
+        entry = self.entry(key)
+
+        # early return if the build isn't cached
+        if not entry.is_dir():
+            return False
+
+        try:
+            # copy the cached artifacts to the target
+            for file in entry.iterdir():
+                if file.name != METADATA:
+                    shutil.copy2(file,target)
+
+            # mark the entry as recently used
+            os.utime(entry)
+        except OSError as e:
+            log.warning(f"Failed to read cache entry {key}: {e}")
+            return False
+
+        return True
+
+    def metadata(self, key: str) -> dict | None:
+        """Get the metadata saved with an entry, if there is any"""
+        try:
+            with open(self.entry(key) / METADATA,'r') as f:
+                return json.load(f)
+        except (OSError,ValueError):
+            return None
+
+    def store(self, key: str, files: list[Path], metadata: dict | None = None):
+        entry = self.entry(key)
+        temp = self.path / f".{key}.{os.getpid()}.{threading.get_ident()}"
+
+        # early return if the build is already cached
+        if entry.is_dir() or not files:
+            return
+
+        try:
+            # copy the artifacts to a private directory
+            temp.mkdir()
+            for file in files:
+                shutil.copy2(file,temp)
+
+            # keep the metadata next to the artifacts
+            if metadata is not None:
+                with open(temp / METADATA,'w') as f:
+                    json.dump(metadata,f)
+
+            # move the entry into place all at once
+            os.rename(temp,entry)
+        except OSError as e:
+            log.warning(f"Failed to write cache entry {key}: {e}")
+            shutil.rmtree(temp, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            total = 0
+
+            # find the size and last use of each entry
+            for entry in self.path.iterdir():
+                if not entry.is_dir() or entry.name.startswith('.'):
+                    continue
+
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                entries.append((entry.stat().st_mtime,size,entry))
+                total += size
+
+            # delete the least recently used entries first
+            entries.sort(key=lambda e: e[0])
+
+            for _, size, entry in entries:
+                if total <= self.size:
+                    break
+
+                log.debug(f"Evicting cache entry {entry.name}")
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
@@ -0,0 +1,89 @@
+import json
+import logging
+
+import numpy as np
+
+from pathlib import Path
+
+from benchmarks.program import Program
+from benchmarks.cache import BuildCache
+
+log = logging.getLogger()
+
+# input passed to the calibration programs (which ignore it)
+CALIBRATION_INPUT: int = 0
+
+def find_calibration(config: dict, languages: set[str]) -> list[Program]:
+    """Find the calibration program of each language under 'calibration.path'"""
+    path = Path(config.get('calibration',{}).get('path','data/calibration'))
+
+    if not path.exists():
+        return []
+
+    return [
+        Program(p) for p in sorted(path.iterdir())
+        if p.is_file() and p.suffix != '.toml' and p.suffix.lstrip('.') in languages
+    ]
+
+def calibrate(config: dict, languages: set[str], cache: BuildCache | None = None) -> dict[str,dict]:
+    """
+    Measure the startup cost of each language
+
+    Builds a trivial program for each language with the same tools,
+    options and commands as the benchmarks, then runs it 'runs' times
+    (under 'calibration'). Returns the run times (in ns) of each
+    language with their median, mean, minimum, maximum and 5th and
+    95th percentiles. The median is used as the startup time.
+    """
+    calibration = config.get('calibration',{})
+    runs = int(calibration.get('runs','20'))
+    timeout = int(config.get('general',{}).get('timeout','3600'))
+
+    baselines = {}
+
+    for program in find_calibration(config,languages):
+        program.build(config,cache)
+
+        if not program.built():
+            stdout, stderr = program.output()
+            log.warning(f"Failed to build {program.name()} for calibration:\n{stdout}\n{stderr}")
+            continue
+
+        results = [ program.run(config,CALIBRATION_INPUT,i,timeout) for i in range(runs) ]
+        times = np.array([ r.run_time for r in results if not r.failed ])
+
+        if not len(times):
+            log.warning(f"Every calibration run of {program.name()} failed")
+            continue
+
+        baselines[program.language()] = {
+            'program': program.name(),
+            'build': program.build_hash,
+            'runs': times.tolist(),
+            'median': float(np.median(times)),
+            'mean': float(np.mean(times)),
+            'minimum': float(np.min(times)),
+            'maximum': float(np.max(times)),
+            'p5': float(np.percentile(times,5)),
+            'p95': float(np.percentile(times,95))
+        }
+
+        log.info(f"Startup time of {program.language()} is {baselines[program.language()]['median'] / 1e6:.2f}ms")
+
+    return baselines
+
+def save_calibration(path: Path, baselines: dict[str,dict]):
+    with open(path,'w') as f:
+        json.dump(baselines, f, indent=4)
+
+def load_calibration(path: Path) -> dict[str,dict]:
+    """Load the startup times of a calibration, or nothing if there isn't one"""
+    try:
+        with open(path,'r') as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+def startup_times(baselines: dict[str,dict]) -> dict[str,float]:
+    """Get the startup time (in ns) of each calibrated language"""
+    return { language: item['median'] for language, item in baselines.items() }
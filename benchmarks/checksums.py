@@ -0,0 +1,78 @@
+import toml
+import logging
+import functools
+
+from pathlib import Path
+from typing import Iterable
+from collections import Counter
+
+from benchmarks.result import SeriesResult
+
+log = logging.getLogger()
+
+def input_key(input: int | float) -> str:
+    """Format an input the way it's written on the command line"""
+    value = float(input)
+    return str(int(value)) if value.is_integer() else str(value)
+
+@functools.lru_cache(maxsize=None)
+def load_checksums(path: str) -> dict[str,dict[str,str]]:
+    """
+    Load the reference output hashes, by benchmark and then input
+
+    The file is a toml table for each benchmark, mapping each input to
+    the SHA-256 of the expected output. Returns nothing if the file
+    doesn't exist.
+    """
+    if not Path(path).exists():
+        return {}
+
+    return toml.load(path)
+
+def expected_checksum(config: dict, benchmark: str, input: int | float) -> str | None:
+    """Get the reference hash of a benchmark's output, if verification is enabled"""
+    checksums = config.get('checksums',{})
+
+    if not checksums.get('enabled',True):
+        return None
+
+    references = load_checksums(str(checksums.get('path','data/checksums.toml')))
+    return references.get(benchmark,{}).get(input_key(input))
+
+def record_checksums(path: Path, series: Iterable[SeriesResult], overwrite: bool = False) -> int:
+    """
+    Save the output hashes of a set of series as the reference hashes
+
+    Every program of a benchmark should print the same output for an
+    input, so the most common hash of their successful runs is kept
+    (with a warning if they disagree). Existing hashes are kept unless
+    'overwrite' is set. Returns the number of hashes saved.
+    """
+    found = {}
+
+    for item in series:
+        for run in item.run_results:
+            if run.output_hash and not run.timed_out and run.exit_code == 0:
+                key = (item.bench_name(),input_key(item.input))
+                found.setdefault(key,Counter())[run.output_hash] += 1
+
+    references = toml.load(path) if path.exists() else {}
+    count = 0
+
+    for (benchmark, input), hashes in sorted(found.items()):
+        if len(hashes) > 1:
+            log.warning(f"Programs disagree on the output of {benchmark} (input={input}), keeping the most common")
+
+        inputs = references.setdefault(benchmark,{})
+        if input in inputs and not overwrite:
+            continue
+
+        inputs[input] = hashes.most_common(1)[0][0]
+        count += 1
+
+    with open(path,'w') as f:
+        toml.dump(references,f)
+
+    load_checksums.cache_clear()
+
+    return count
@@ -11,7 +11,7 @@ def run():
     parser.add_argument('-t','--targets', 
         dest='targets',
         nargs='+',
-        help='Any of "programs", "dependencies", or "output"')
+        help='Any of "programs", "dependencies", "output", or "cache"')
     
     # parse the command line arguments
     args = vars(parser.parse_args())
@@ -22,5 +22,6 @@ def run():
         {
             "programs": clear_programs,
             "dependencies": clear_dependencies,
-            "output": clear_output
+            "output": clear_output,
+            "cache": clear_cache
         }[target]()
\ No newline at end of file
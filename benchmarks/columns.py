@@ -0,0 +1,100 @@
+import math
+
+from array import array
+
+from benchmarks.stats import Aggregate
+from benchmarks.result import RunResult
+from benchmarks.counters import HARDWARE, SOFTWARE
+
+# array type codes of the run fields stored as columns
+RUN_FIELDS: dict[str,str] = {
+    'index': 'q',
+    'input': 'd',
+    'run_time': 'd',
+    'start_time': 'q',
+    'stop_time': 'q',
+    'average_cpu_busy': 'd',
+    'utilization': 'd',
+    'active_threads': 'q',
+    'thread_imbalance': 'd',
+    'user_cpu_time': 'd',
+    'sys_cpu_time': 'd',
+    'total_cpu_time': 'd',
+    'max_rss': 'q',
+    'peak_rss': 'q',
+    'exit_code': 'q',
+    'minor_faults': 'q',
+    'major_faults': 'q',
+    'voluntary_switches': 'q',
+    'involuntary_switches': 'q',
+    'output_size': 'q',
+    'first_byte_time': 'd',
+    'output_rate': 'd',
+    'failed': 'b',
+    'timed_out': 'b',
+    'wrong_output': 'b',
+}
+
+# performance counters stored as columns (NaN if not counted)
+COUNTER_FIELDS: tuple = tuple(HARDWARE) + tuple(SOFTWARE)
+
+class RunColumns:
+    """
+    The runs of one series, stored as typed array columns
+
+    Each field in RUN_FIELDS is kept in an 'array' instead of as an
+    attribute of a RunResult, as is each counter in COUNTER_FIELDS.
+    Running statistics of the run and CPU times are updated as runs
+    are appended. Sample lists are not kept. This is how the runs of
+    stored suites are loaded into result tables (see Store.columns);
+    convert back to RunResult objects with 'to_results'.
+    """
+
+    def __init__(self):
+        self.columns = { name: array(code) for name, code in RUN_FIELDS.items() }
+        self.columns.update({ name: array('d') for name in COUNTER_FIELDS })
+        self.run_time = Aggregate()
+        self.cpu_time = Aggregate()
+
+    def __len__(self) -> int:
+        return len(self.columns['index'])
+
+    def __getitem__(self, name: str) -> array:
+        return self.columns[name]
+
+    def append(self, values: dict):
+        """Append a run from a dict of its fields (see RunResult.dict)"""
+        for name in RUN_FIELDS:
+            self.columns[name].append(values.get(name,0) or 0)
+
+        counters = values.get('counters') or {}
+        for name in COUNTER_FIELDS:
+            self.columns[name].append(counters.get(name,math.nan))
+
+        self.run_time.add(values.get('run_time',0) or 0)
+        self.cpu_time.add(values.get('total_cpu_time',0) or 0)
+
+    def append_result(self, result: RunResult):
+        self.append(result.dict(include=set(RUN_FIELDS) | {'counters'}))
+
+    def extend(self, results: list[RunResult]):
+        for result in results:
+            self.append_result(result)
+
+    def to_results(self) -> list[RunResult]:
+        results = []
+        for i in range(len(self)):
+            values = { name: self.columns[name][i] for name in RUN_FIELDS }
+            counters = { name: self.columns[name][i] for name in COUNTER_FIELDS }
+
+            # leave out the counters that weren't counted
+            values['counters'] = { k: v for k, v in counters.items() if not math.isnan(v) }
+            results.append(RunResult(**values))
+
+        return results
+
+    @classmethod
+    def from_results(cls, results: list[RunResult]) -> 'RunColumns':
+        columns = cls()
+        columns.extend(results)
+        return columns
@@ -0,0 +1,151 @@
+import os
+import ctypes
+import struct
+import logging
+import platform
+
+log = logging.getLogger()
+
+# perf_event_open syscall numbers by machine
+SYSCALLS: dict[str,int] = {
+    'x86_64': 298,
+    'aarch64': 241,
+    'armv7l': 364,
+    'i686': 336,
+    'ppc64le': 319,
+    'riscv64': 241
+}
+
+# event types
+PERF_TYPE_HARDWARE: int = 0
+PERF_TYPE_SOFTWARE: int = 1
+
+# attribute flags (bit positions in the flags field)
+DISABLED: int = 1 << 0
+INHERIT: int = 1 << 1
+EXCLUDE_KERNEL: int = 1 << 5
+EXCLUDE_HV: int = 1 << 6
+ENABLE_ON_EXEC: int = 1 << 12
+
+# read the enabled and running times with each value
+READ_FORMAT: int = 1 | 2
+
+PERF_FLAG_FD_CLOEXEC: int = 1 << 3
+
+# hardware events, by the name they're saved under
+HARDWARE: dict[str,int] = {
+    'cycles': 0,
+    'instructions': 1,
+    'cache_references': 2,
+    'cache_misses': 3,
+    'branch_misses': 5
+}
+
+# software events, used when there are no hardware events
+SOFTWARE: dict[str,int] = {
+    'task_clock': 1,
+    'page_faults': 2,
+    'context_switches': 3,
+    'cpu_migrations': 4
+}
+
+class PerfEventAttr(ctypes.Structure):
+    """The first version (64 bytes) of 'struct perf_event_attr'"""
+    _fields_ = [
+        ('type', ctypes.c_uint32),
+        ('size', ctypes.c_uint32),
+        ('config', ctypes.c_uint64),
+        ('sample_period', ctypes.c_uint64),
+        ('sample_type', ctypes.c_uint64),
+        ('read_format', ctypes.c_uint64),
+        ('flags', ctypes.c_uint64),
+        ('wakeup_events', ctypes.c_uint32),
+        ('bp_type', ctypes.c_uint32),
+        ('config1', ctypes.c_uint64)
+    ]
+
+libc = ctypes.CDLL(None, use_errno=True)
+
+def perf_event_open(kind: int, config: int, pid: int = 0) -> int:
+    """
+    Open a counter for a process (or the calling thread if 'pid' is 0)
+    and the children it creates
+
+    The counter starts disabled, and is enabled when the process (or a
+    child of the calling thread) calls exec, so it only counts the
+    benchmark (and any processes or threads it creates), not the harness. Kernel events are left
+    out so that this works without privileges. Returns the file
+    descriptor of the counter, or raises OSError.
+    """
+    number = SYSCALLS.get(platform.machine())
+
+    if number is None:
+        raise OSError(f"perf_event_open isn't known for {platform.machine()}")
+
+    attr = PerfEventAttr()
+    attr.type = kind
+    attr.size = ctypes.sizeof(PerfEventAttr)
+    attr.config = config
+    attr.read_format = READ_FORMAT
+    attr.flags = DISABLED | INHERIT | EXCLUDE_KERNEL | EXCLUDE_HV | ENABLE_ON_EXEC
+
+    fd = libc.syscall(number, ctypes.byref(attr), pid, -1, -1, PERF_FLAG_FD_CLOEXEC)
+
+    if fd < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+
+    return fd
+
+def read_counter(fd: int) -> float:
+    """Read a counter, scaled up if it was only running part of the time"""
+    value, enabled, running = struct.unpack('QQQ', os.read(fd, 24))
+
+    if running and running < enabled:
+        return value * enabled / running
+
+    return float(value)
+
+class Counters:
+    """
+    A set of performance counters for one run
+
+    Create it just before starting the benchmark, on the thread that
+    starts it (or for the pid of a benchmark that hasn't called exec
+    yet), and read it after the benchmark has been waited for.
+    Hardware events are used if the machine has them, otherwise the
+    software events (which virtual machines usually still provide).
+    """
+
+    def __init__(self, events: list[str] | None = None, pid: int = 0):
+        self.fds = {}
+
+        # try the hardware events, then fall back to software events
+        for table, kind in ((HARDWARE,PERF_TYPE_HARDWARE),(SOFTWARE,PERF_TYPE_SOFTWARE)):
+            names = [ n for n in table if not events or n in events ]
+
+            # fall back to every software event if none were asked for
+            if not names and kind == PERF_TYPE_SOFTWARE:
+                names = list(table)
+
+            for name in names:
+                try:
+                    self.fds[name] = perf_event_open(kind,table[name],pid)
+                except OSError as e:
+                    log.debug(f"Counter {name} is unavailable: {e}")
+
+                    # don't mix a partial set of hardware events with software events
+                    if kind == PERF_TYPE_HARDWARE:
+                        self.close()
+                        break
+
+            if self.fds:
+                break
+
+    def read(self) -> dict[str,float]:
+        return { name: read_counter(fd) for name, fd in self.fds.items() }
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
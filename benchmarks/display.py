@@ -1,13 +1,21 @@
 import os
+import json
 import toml
+import hashlib
+import logging
 import argparse
+import matplotlib
 
 import numpy as np
-import matplotlib.pyplot as plt
 
 from pathlib import Path
+from matplotlib.figure import Figure
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from benchmarks.result import SummaryResult, SeriesResult
+from benchmarks.result import SummaryResult
+from benchmarks.store import Store
+from benchmarks.analysis import summarize, scaling, variants, toolchains, analysis_settings
+from benchmarks.table import ResultTable, SERIES_KEYS, load_results, load_store, load_history
 from benchmarks.utilities import setup_logger
 
 CHART_HEIGHT: int = 10 
@@ -17,45 +25,89 @@ BAR_PAD_TOP: float = 0.25
 BAR_WIDTH: float = 0.18
 BAR_LABEL: str = '{:.2f}'
 
-def load_result(path: Path | str) -> SeriesResult:
-    path = Path(path)
-    assert path.exists(), f"Path doesn't exist: {str(path)}"
-    result = None
+CHART_DPI: int = 200
+FONT_SIZE: int = 20
 
-    try:
-        result = SeriesResult.parse_file(path)
-    except Exception as e:
-        print(f"e: {e}, path={str(path)}")
+COLORS: dict[str,str] = {
+    'rust': 'blue',
+    'ada': 'green',
+    'java': 'red',
+    'java (steady)': 'darkred',
+    'c': 'lightgray',
+    'cpp': 'gray'
+}
 
-    return result
+# hashes of the charts drawn last time, by file name
+MANIFEST: str = 'charts.json'
 
-def load_results(path: Path | str) -> list[SeriesResult]:
-    results = []
-    for root, _, files in os.walk(path):
-        for name in files:
-            file = Path(os.path.join(root, name))
-            result = load_result(file)
+log = logging.getLogger()
 
-            if result:
-                results.append(result)
-    return results
+# charts are only saved to files, never shown
+matplotlib.use('Agg')
+
+def collate(groups: dict[str,np.ndarray], scale: float = 1.0) -> dict:
+    """
+    Arrange grouped statistics as bars by benchmark, input and language
+
+    Bars show the median, with error bars for the confidence interval
+    of the median (see analysis.summarize). Only the first program (the
+    lowest complexity) of each language is shown for an input, and
+    flag variants and other toolchains are left out. Values are
+    multiplied by 'scale'.
+    """
+    collated = {}
+
+    for i in range(len(groups['count'])):
+        bench = str(groups['benchmark'][i])
+        input = float(groups['input'][i])
+        lang  = str(groups['language'][i])
+
+        languages = collated.setdefault(bench,{}).setdefault(input,{})
+
+        if lang in languages or groups['variant'][i] or groups['toolchain'][i]:
+            continue
+
+        value = groups['median'][i] * scale
+        minimum = groups['lower'][i] * scale
+        maximum = groups['upper'][i] * scale
+
+        languages[lang] = {
+            'value': value,
+            'minimum': value - minimum,
+            'maximum': maximum - value
+        }
+
+    return collated
+
+def chart_data(inputs: dict) -> tuple[tuple[str],dict]:
+    """Get the labels and bars (one per input for each language) to chart"""
+    keys = sorted(inputs)
+    languages = sorted({ l for v in inputs.values() for l in v })
+
+    # leave a gap where a language has no result for an input
+    empty = { 'value': np.nan, 'minimum': 0, 'maximum': 0 }
+
+    data = {
+        language: [ inputs[k].get(language,empty) for k in keys ]
+        for language in languages
+    }
+
+    return (tuple(str(k) for k in keys),data)
 
 def save_chart(title: str, labels: list[str], path: Path, data: dict, ylabel: str | None = None, xlabel: str | None = None, sideways: bool = False):
+    # use a figure of our own rather than pyplot's global state
+    with matplotlib.rc_context({'font.size': FONT_SIZE}):
+        figure = Figure()
+        ax = figure.subplots()
+        draw_chart(figure,ax,title,labels,data,ylabel,xlabel,sideways)
+        figure.savefig(path, dpi=CHART_DPI, bbox_inches='tight')
+
+def draw_chart(figure: Figure, ax, title: str, labels: list[str], data: dict, ylabel: str | None, xlabel: str | None, sideways: bool):
     x = np.arange(len(labels))
 
     width = BAR_WIDTH
     count = 0
 
-    _, ax = plt.subplots()
-
-    colors = {
-        'rust': 'blue',
-        'ada': 'green',
-        'java': 'red',
-        'c': 'lightgray',
-        'cpp': 'gray'
-    }
-
     # sort the measurements alphabetically
     keys = list(data.keys())
     keys.sort()
@@ -81,7 +133,7 @@ def save_chart(title: str, labels: list[str], path: Path, data: dict, ylabel: st
                 width,
                 xerr=error,
                 label=language, 
-                color=colors[language])
+                color=COLORS.get(language))
         else:
             group = ax.bar(
                 x + offset, 
@@ -89,7 +141,7 @@ def save_chart(title: str, labels: list[str], path: Path, data: dict, ylabel: st
                 width,
                 yerr=error,
                 label=language, 
-                color=colors[language])
+                color=COLORS.get(language))
 
         # add value labels at the tops
         ax.bar_label(
@@ -111,95 +163,541 @@ def save_chart(title: str, labels: list[str], path: Path, data: dict, ylabel: st
 
     ax.set_title(title)
 
+    # only leave room below zero for negative bars (as in changes)
+    negative = any(v['value'] < 0 for m in data.values() for v in m)
+
+    def limits(low: float, limit: float) -> tuple[float,float]:
+        low = min(low,0) if negative else 0
+        limit = max(limit,0)
+        return (low, limit + (limit - low) * BAR_PAD_TOP)
+
     if sideways:
-        _, limit = ax.get_xlim()
-        ax.set_xlim(0, limit * (1 + BAR_PAD_TOP))
+        ax.set_xlim(*limits(*ax.get_xlim()))
         ax.set_yticks(x + width, labels)
-        plt.gcf().set_size_inches(CHART_HEIGHT,CHART_WIDTH)
+        figure.set_size_inches(CHART_HEIGHT,CHART_WIDTH)
     else:
-        _, limit = ax.get_ylim()
-        ax.set_ylim(0, limit * (1 + BAR_PAD_TOP))
+        ax.set_ylim(*limits(*ax.get_ylim()))
         ax.set_xticks(x + width, labels)
-        plt.gcf().set_size_inches(CHART_WIDTH,CHART_HEIGHT)
+        figure.set_size_inches(CHART_WIDTH,CHART_HEIGHT)
+
+def chart_hash(chart: dict) -> str:
+    """Hash the data and settings that a chart is drawn from"""
+    settings = {
+        'chart': chart,
+        'size': (CHART_HEIGHT,CHART_WIDTH,CHART_DPI,FONT_SIZE),
+        'bars': (BAR_PAD_TOP,BAR_WIDTH,BAR_LABEL),
+        'colors': COLORS
+    }
 
-    plt.savefig(path, dpi=200, bbox_inches='tight')
+    data = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
 
-def create_runtime_analysis(path: Path, data: dict, config: dict):
-    for benchmark, input_data in data.items():
+def save_trend(title: str, labels: list[str], path: Path, data: dict, ylabel: str | None = None, xlabel: str | None = None):
+    """Save a line chart with one line (and its confidence band) per input"""
+    with matplotlib.rc_context({'font.size': FONT_SIZE}):
+        figure = Figure()
+        ax = figure.subplots()
 
-        analysis_path = path / f'{benchmark}.runtime.png'
+        # draw the inputs in order
+        for name, line in sorted(data.items(), key=lambda v: float(v[0])):
+            ax.plot(line['x'], line['value'], marker='o', label=name)
+            ax.fill_between(line['x'], line['lower'], line['upper'], alpha=0.2)
+
+        ax.legend(loc='upper left', title='Input Values')
+        ax.set_xticks(np.arange(len(labels)), labels, rotation=45, ha='right')
+        ax.set_ylim(bottom=0)
+        ax.set_title(title)
+
+        if ylabel: ax.set_ylabel(ylabel)
+        if xlabel: ax.set_xlabel(xlabel)
+
+        figure.set_size_inches(CHART_WIDTH,CHART_HEIGHT)
+        figure.savefig(path, dpi=CHART_DPI, bbox_inches='tight')
+
+def save_scaling(title: str, path: Path, data: dict, ylabel: str | None = None, xlabel: str | None = None):
+    """Save a speedup chart with one line per input and the ideal speedup"""
+    with matplotlib.rc_context({'font.size': FONT_SIZE}):
+        figure = Figure()
+        ax = figure.subplots()
+
+        cores = sorted({ c for line in data.values() for c in line['x'] })
+
+        # draw the inputs in order
+        for name, line in sorted(data.items(), key=lambda v: float(v[0])):
+            ax.plot(line['x'], line['value'], marker='o', label=name)
+
+        # perfect scaling from the smallest sweep
+        if cores:
+            ax.plot(cores, [ c / cores[0] for c in cores ], linestyle='--', color='grey', label='ideal')
+
+        ax.legend(loc='upper left', title='Input Values')
+        ax.set_xticks(cores, [ str(c) for c in cores ])
+        ax.set_ylim(bottom=0)
+        ax.set_title(title)
+
+        if ylabel: ax.set_ylabel(ylabel)
+        if xlabel: ax.set_xlabel(xlabel)
+
+        figure.set_size_inches(CHART_WIDTH,CHART_HEIGHT)
+        figure.savefig(path, dpi=CHART_DPI, bbox_inches='tight')
+
+def render_chart(chart: dict) -> Path:
+    chart = dict(chart)
+
+    # draw with the function for the kind of chart
+    kind = chart.pop('kind','bar')
+    {
+        'bar': save_chart,
+        'trend': save_trend,
+        'scaling': save_scaling
+    }[kind](**chart)
+
+    return chart['path']
+
+def render_charts(path: Path, charts: list[dict], jobs: int = 1, force: bool = False):
+    """
+    Draw charts in parallel, skipping those that haven't changed
+
+    A chart is redrawn when the hash of its data and settings differs
+    from the one saved in the manifest the last time it was drawn, or
+    when its file is missing. Pass 'force' to redraw every chart.
+    """
+    manifest_path = path / MANIFEST
+    manifest = {}
+
+    if manifest_path.exists() and not force:
+        with open(manifest_path,'r') as f:
+            manifest = json.load(f)
+
+    # find the charts that need to be drawn again
+    pending = {}
+    for chart in charts:
+        name = Path(chart['path']).name
+        digest = chart_hash(chart)
 
-        input_data = list(input_data.items())
-        input_data.sort(key=lambda v: v[0])
+        if manifest.get(name) != digest or not Path(chart['path']).exists():
+            pending[name] = (digest,chart)
 
-        # get labels for benchmark groupings
-        inputs = tuple(str(k[0]) for k in input_data)
+    log.info(f"Drawing {len(pending)} of {len(charts)} charts")
 
-        results = {}
+    with ProcessPoolExecutor(max_workers=max(jobs,1)) as pool:
+        futures = {
+            pool.submit(render_chart,chart): (name,digest)
+            for name, (digest,chart) in pending.items()
+        }
 
-        for _, language_data in input_data:
+        for future in as_completed(futures):
+            name, digest = futures[future]
+            try:
+                future.result()
+                manifest[name] = digest
+            except Exception as e:
+                log.warning(f"Failed to draw {name}: {e}")
 
-            for language, series in language_data.items():
-                if language not in results.keys():
-                    results[language] = []
+    with open(manifest_path,'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
 
-                value = series.average_run_time_ms()
-                maximum = series.maximum_run_time_ms()
-                minimum = series.minimum_run_time_ms()
+def create_runtime_analysis(path: Path, table: ResultTable, config: dict) -> list[dict]:
+    charts = []
 
-                results[language].append({
-                    'value': value,
-                    'minimum': value - minimum,
-                    'maximum': maximum - value
-                })
+    runs = table.select((table['kind'] == 'run') & ~table['failed'])
+    groups = summarize(runs,'run_time',*analysis_settings(config))
 
-        save_chart(
+    for benchmark, inputs in collate(groups,1e-6).items():
+
+        analysis_path = path / f'{benchmark}.runtime.png'
+        labels, results = chart_data(inputs)
+
+        charts.append(dict(
             title=benchmark,
-            labels=inputs,
+            labels=labels,
             path=analysis_path,
             data=results,
-            ylabel='Runtime (ms)',
+            ylabel='Median Runtime (ms)',
             xlabel='Input Values',
             sideways=True
-        )
+        ))
 
-def create_usage_analysis(path: Path, data: dict, config: dict):
-    for benchmark, input_data in data.items():
+    return charts
 
-        analysis_path = path / f'{benchmark}.cpu.png'
+def create_corrected_analysis(path: Path, table: ResultTable, config: dict) -> list[dict]:
+    charts = []
+
+    # only chart series with a calibrated startup time
+    runs = table.select((table['kind'] == 'run') & ~table['failed'] & np.isfinite(table['corrected_run_time']))
+
+    if not len(runs):
+        return charts
 
-        input_data = list(input_data.items())
-        input_data.sort(key=lambda v: v[0])
+    groups = summarize(runs,'corrected_run_time',*analysis_settings(config))
 
-        # get labels for benchmark groupings
-        inputs = tuple(str(k[0]) for k in input_data)
+    for benchmark, inputs in collate(groups,1e-6).items():
 
-        results = {}
+        analysis_path = path / f'{benchmark}.corrected.png'
+        labels, results = chart_data(inputs)
+
+        charts.append(dict(
+            title=f'{benchmark} (without startup)',
+            labels=labels,
+            path=analysis_path,
+            data=results,
+            ylabel='Median Runtime without Startup (ms)',
+            xlabel='Input Values',
+            sideways=True
+        ))
 
-        for _, language_data in input_data:
+    return charts
 
-            for language, series in language_data.items():
-                if language not in results.keys():
-                    results[language] = []
+def create_usage_analysis(path: Path, table: ResultTable, config: dict) -> list[dict]:
+    charts = []
 
-                value = series.average_cpu_time_us()
-                maximum = series.maximum_cpu_time_us()
-                minimum = series.minimum_cpu_time_us()
+    runs = table.select((table['kind'] == 'run') & ~table['failed'])
+    groups = summarize(runs,'total_cpu_time',*analysis_settings(config))
 
-                results[language].append({
-                    'value': value,
-                    'minimum': value - minimum,
-                    'maximum': maximum - value
-                })
+    for benchmark, inputs in collate(groups).items():
 
-        save_chart(
+        analysis_path = path / f'{benchmark}.cpu.png'
+        labels, results = chart_data(inputs)
+
+        charts.append(dict(
             title=benchmark,
-            labels=inputs,
+            labels=labels,
+            path=analysis_path,
+            data=results,
+            ylabel='Median CPU Busy (us)',
+            xlabel='Input Values'
+        ))
+
+    return charts
+
+def create_parallel_analysis(path: Path, table: ResultTable, config: dict) -> list[dict]:
+    charts = []
+
+    runs = table.select((table['kind'] == 'run') & ~table['failed'])
+
+    metrics = {
+        'utilization': ('utilization', 'Median Cores Busy'),
+        'imbalance': ('thread_imbalance', 'Median Thread Imbalance (busiest / mean)')
+    }
+
+    for name, (value, label) in metrics.items():
+
+        # only chart runs of default builds that recorded the metric
+        measured = runs.select(np.isfinite(runs[value]) & (runs[value] > 0)
+            & (runs['variant'] == '') & (runs['toolchain'] == ''))
+        if not len(measured):
+            continue
+
+        groups = summarize(measured,value,*analysis_settings(config))
+
+        for benchmark, inputs in collate(groups).items():
+
+            analysis_path = path / f'{benchmark}.{name}.png'
+            labels, results = chart_data(inputs)
+
+            charts.append(dict(
+                title=benchmark,
+                labels=labels,
+                path=analysis_path,
+                data=results,
+                ylabel=label,
+                xlabel='Input Values'
+            ))
+
+    return charts
+
+def create_steady_analysis(path: Path, table: ResultTable, config: dict) -> list[dict]:
+    charts = []
+
+    skip = int(config.get('steady',{}).get('skip','0'))
+
+    # leave out the skipped steady-state iterations
+    steady = table.select((table['kind'] == 'steady') & (table['index'] >= skip))
+
+    if not len(steady):
+        return charts
+
+    settings = analysis_settings(config)
+
+    steady_groups = summarize(steady,'run_time',*settings)
+    keys = set(zip(*(steady_groups[k].tolist() for k in SERIES_KEYS)))
+
+    # only compare against series with steady-state results
+    runs = table.select((table['kind'] == 'run') & ~table['failed'])
+    run_groups = summarize(runs,'run_time',*settings)
+    mask = np.array([ k in keys for k in zip(*(run_groups[k].tolist() for k in SERIES_KEYS)) ], dtype=bool)
+    run_groups = { k: v[mask] for k, v in run_groups.items() }
+
+    collated = collate(run_groups,1e-6)
+
+    for benchmark, inputs in collate(steady_groups,1e-6).items():
+
+        analysis_path = path / f'{benchmark}.steady.png'
+
+        # pair each steady-state bar with the startup-inclusive bar
+        for input, languages in inputs.items():
+            for language in list(languages):
+                languages[f'{language} (steady)'] = languages.pop(language)
+
+                # series without a successful run only get the steady-state bar
+                run = collated.get(benchmark,{}).get(input,{}).get(language)
+                if run is not None:
+                    languages[language] = run
+
+        labels, results = chart_data(inputs)
+
+        charts.append(dict(
+            title=f'{benchmark} (startup vs. steady-state)',
+            labels=labels,
             path=analysis_path,
             data=results,
-            ylabel='CPU Busy (us)',
+            ylabel='Median Runtime (ms)',
+            xlabel='Input Values',
+            sideways=True
+        ))
+
+    return charts
+
+def create_counter_analysis(path: Path, table: ResultTable, config: dict) -> list[dict]:
+    charts = []
+
+    runs = table.select((table['kind'] == 'run') & ~table['failed'])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = {
+            'ipc': (runs['instructions'] / runs['cycles'], 1, 'Instructions per Cycle'),
+            'cache': (runs['cache_misses'] / runs['cache_references'], 100, 'Cache Misses (%)'),
+            'branch': (runs['branch_misses'] / runs['instructions'], 1000, 'Branch Misses per 1000 Instructions')
+        }
+
+    for name, (values, scale, label) in ratios.items():
+
+        # only chart runs that had hardware counters
+        counted = np.isfinite(values)
+        if not counted.any():
+            continue
+
+        selected = ResultTable({ **runs.columns, name: values }).select(counted)
+        groups = summarize(selected,name,*analysis_settings(config))
+
+        for benchmark, inputs in collate(groups,scale).items():
+
+            analysis_path = path / f'{benchmark}.{name}.png'
+            labels, results = chart_data(inputs)
+
+            charts.append(dict(
+                title=benchmark,
+                labels=labels,
+                path=analysis_path,
+                data=results,
+                ylabel=f'Median {label}',
+                xlabel='Input Values'
+            ))
+
+    return charts
+
+def create_build_analysis(path: Path, table: ResultTable, config: dict) -> list[dict]:
+    charts = []
+
+    # flag variants and toolchains are compared in their own charts
+    runs = table.select((table['kind'] == 'run') & (table['variant'] == '') & (table['toolchain'] == ''))
+
+    metrics = {
+        'build': ('build_time', 1e-9, 'Build Time (s)'),
+        'size': ('binary_size', 1 / 1024, 'Binary Size (KB)')
+    }
+
+    for name, (value, scale, label) in metrics.items():
+
+        # only chart programs with build metrics
+        built = runs.select(np.isfinite(runs[value]))
+        if not len(built):
+            continue
+
+        # every run of a series has the same build, so bars are the mean
+        # of the builds, with error bars for the range across builds
+        groups = built.group(['benchmark','complexity','language'],value)
+
+        collated = {}
+        for i in range(len(groups['count'])):
+            programs = collated.setdefault(str(groups['benchmark'][i]),{})
+            languages = programs.setdefault(int(groups['complexity'][i]),{})
+
+            mean = groups['mean'][i] * scale
+            languages[str(groups['language'][i])] = {
+                'value': mean,
+                'minimum': mean - groups['minimum'][i] * scale,
+                'maximum': groups['maximum'][i] * scale - mean
+            }
+
+        for benchmark, programs in collated.items():
+
+            analysis_path = path / f'{benchmark}.{name}.png'
+            labels, results = chart_data(programs)
+
+            charts.append(dict(
+                title=benchmark,
+                labels=labels,
+                path=analysis_path,
+                data=results,
+                ylabel=label,
+                xlabel='Program'
+            ))
+
+    return charts
+
+def create_scaling_analysis(path: Path, table: ResultTable, config: dict) -> list[dict]:
+    charts = []
+
+    programs = {}
+
+    for item in scaling(table):
+        program = f"{item['benchmark']}-{item['complexity']}.{item['language']}"
+
+        # a sweep needs more than one core count
+        if len(item['threads']) < 2:
+            continue
+
+        programs.setdefault(program,{})[str(item['input'])] = {
+            'x': item['threads'],
+            'value': item['speedup']
+        }
+
+    for program, lines in programs.items():
+        charts.append(dict(
+            kind='scaling',
+            title=f'{program} (speedup)',
+            path=path / f'{program}.scaling.png',
+            data=lines,
+            ylabel='Speedup',
+            xlabel='Cores'
+        ))
+
+    return charts
+
+def create_variant_analysis(path: Path, table: ResultTable, config: dict) -> list[dict]:
+    charts = []
+
+    runs = table.select(table['kind'] == 'run')
+
+    programs = {}
+
+    for item in variants(runs,'run_time',*analysis_settings(config)):
+        program = f"{item['benchmark']}-{item['complexity']}.{item['language']}"
+        default = item['default']
+
+        # bars are the speedup over the default build, with error bars
+        # from the confidence interval of each median
+        programs.setdefault(program,{})[item['input']] = {
+            variant or 'default': {
+                'value': build['speedup'],
+                'minimum': build['speedup'] - default / build['upper'],
+                'maximum': default / build['lower'] - build['speedup']
+            }
+            for variant, build in item['variants'].items()
+        }
+
+    for program, inputs in programs.items():
+
+        labels, results = chart_data(inputs)
+
+        charts.append(dict(
+            title=f'{program} (variants)',
+            labels=labels,
+            path=path / f'{program}.variants.png',
+            data=results,
+            ylabel='Speedup over Default Build',
             xlabel='Input Values'
-        )
+        ))
+
+    return charts
+
+def create_toolchain_analysis(path: Path, table: ResultTable, config: dict) -> list[dict]:
+    charts = []
+
+    runs = table.select(table['kind'] == 'run')
+
+    programs = {}
+
+    for item in toolchains(runs,'run_time',*analysis_settings(config)):
+        program = f"{item['benchmark']}-{item['complexity']}.{item['language']}"
+        default = item['default']
+
+        # bars are the change from the default toolchain (in percent),
+        # with error bars from the confidence interval of each median
+        programs.setdefault(program,{})[item['input']] = {
+            f"{name} ({build['version']})" if build['version'] else name: {
+                'value': build['change'] * 100,
+                'minimum': (build['median'] - build['lower']) / default * 100,
+                'maximum': (build['upper'] - build['median']) / default * 100
+            }
+            for name, build in item['toolchains'].items() if name
+        }
+
+    for program, inputs in programs.items():
+
+        labels, results = chart_data(inputs)
+
+        charts.append(dict(
+            title=f'{program} (toolchains)',
+            labels=labels,
+            path=path / f'{program}.toolchains.png',
+            data=results,
+            ylabel='Change from Default Toolchain (%)',
+            xlabel='Input Values'
+        ))
+
+    return charts
+
+def create_trend_analysis(path: Path, history: ResultTable, config: dict) -> list[dict]:
+    charts = []
+
+    # leave out failed runs, and the series of scaling sweeps, flag variants and toolchains
+    history = history.select(~history['failed'] & (history['threads'] == 0) & (history['variant'] == '') & (history['toolchain'] == ''))
+
+    # trends need more than one suite
+    if len(np.unique(history['suite'])) < 2:
+        return charts
+
+    keys = SERIES_KEYS + ['suite','timestamp']
+    groups = summarize(history,'run_time',*analysis_settings(config),keys=keys)
+
+    # label each suite with its date, in order of date
+    suites = dict(zip(groups['suite'].tolist(),groups['timestamp'].tolist()))
+    suites = { s: f'{suites[s][:10]} ({s})' for s in sorted(suites,key=lambda s: (suites[s],s)) }
+    positions = { s: i for i, s in enumerate(suites) }
+
+    programs = {}
+
+    for i in range(len(groups['count'])):
+        program = f"{groups['benchmark'][i]}-{groups['complexity'][i]}.{groups['language'][i]}"
+        suite = int(groups['suite'][i])
+
+        lines = programs.setdefault(program,{})
+        line = lines.setdefault(str(float(groups['input'][i])),{
+            'x': [],
+            'value': [],
+            'lower': [],
+            'upper': []
+        })
+
+        line['x'].append(positions[suite])
+        line['value'].append(groups['median'][i] * 1e-6)
+        line['lower'].append(groups['lower'][i] * 1e-6)
+        line['upper'].append(groups['upper'][i] * 1e-6)
+
+    for program, lines in programs.items():
+        charts.append(dict(
+            kind='trend',
+            title=program,
+            labels=list(suites.values()),
+            path=path / f'{program}.trend.png',
+            data=lines,
+            ylabel='Median Runtime (ms)',
+            xlabel='Suite'
+        ))
+
+    return charts
 
 def run():
 
@@ -227,6 +725,29 @@ def run():
         default='warn',
         help='The level to log at')
 
+    parser.add_argument('-d','--database', 
+        dest='database', 
+        action='store',
+        default='output/results.db',
+        help='Path to the results database')
+
+    parser.add_argument('-s','--suite', 
+        dest='suite', 
+        action='store',
+        default=None,
+        help='The suite to display (defaults to the latest)')
+
+    parser.add_argument('-j','--jobs', 
+        dest='jobs', 
+        action='store',
+        default=os.cpu_count(),
+        help='Number of charts to draw at once')
+
+    parser.add_argument('--force', 
+        dest='force', 
+        action='store_true',
+        help='Redraw every chart, even if its data is unchanged')
+
     args = vars(parser.parse_args())
 
     # get the benchmark configuration file
@@ -250,32 +771,46 @@ def run():
 
     output_path.mkdir(exist_ok=True) 
 
-    # load all results as SeriesResult objects
-    log.debug("loading benchmark results")
-    results = load_results(results_path)
+    database_path = Path(args['database'])
 
-    # load the summary as a SummaryResult object
-    log.debug("loading benchmark summary")
-    summary = SummaryResult.parse_file(summary_path)
-
-    # sort the results for display
-    collated = {}
+    # load all results as a table of runs
+    log.debug("loading benchmark results")
 
-    for result in results:
-        bench = result.bench_name()
-        input = result.input
-        lang  = result.language
+    store = None
+    suite = None
 
-        if bench not in collated:
-            collated[bench] = {}
+    if database_path.exists():
+        store = Store(database_path)
+        suite = args['suite'] or store.latest_suite()
 
-        if input not in collated[bench]:
-            collated[bench][input] = {}
+    # an empty database counts as no database
+    if suite is not None:
+        table = load_store(store,suite=int(suite))
+        history = load_history(store)
+    else:
+        table = load_results(results_path)
+        history = None
 
-        if lang not in collated[bench][input]:
-            collated[bench][input][lang] = result
+    if store:
+        store.close()
 
-    plt.rcParams.update({'font.size': 20})
+    # load the summary as a SummaryResult object
+    log.debug("loading benchmark summary")
+    summary = SummaryResult.parse_file(summary_path)
 
-    create_runtime_analysis(output_path,collated,config)
-    create_usage_analysis(output_path,collated,config)
\ No newline at end of file
+    charts = []
+    charts.extend(create_runtime_analysis(output_path,table,config))
+    charts.extend(create_corrected_analysis(output_path,table,config))
+    charts.extend(create_usage_analysis(output_path,table,config))
+    charts.extend(create_parallel_analysis(output_path,table,config))
+    charts.extend(create_steady_analysis(output_path,table,config))
+    charts.extend(create_counter_analysis(output_path,table,config))
+    charts.extend(create_build_analysis(output_path,table,config))
+    charts.extend(create_scaling_analysis(output_path,table,config))
+    charts.extend(create_variant_analysis(output_path,table,config))
+    charts.extend(create_toolchain_analysis(output_path,table,config))
+
+    if history:
+        charts.extend(create_trend_analysis(output_path,history,config))
+
+    render_charts(output_path,charts,int(args['jobs']),args['force'])
@@ -0,0 +1,227 @@
+import os
+import json
+import logging
+import threading
+
+from pathlib import Path
+from typing import Iterator
+
+from benchmarks.result import RunResult, SeriesResult
+
+log = logging.getLogger()
+
+class Journal:
+    """
+    An append-only log of results in JSON lines format
+
+    Every record is flushed and synced to disk as soon as it's
+    written, so a crash loses at most the run in progress.
+    """
+
+    def __init__(self, path: Path | str, truncate: bool = True):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.file = open(self.path, 'w' if truncate else 'a')
+
+    def write(self, record: dict):
+        line = json.dumps(record) + '\n'
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def record_run(self, series: SeriesResult, result: RunResult, kind: str = 'run', build: str | None = None):
+        self.write({
+            'type': kind,
+            'bench': series.bench,
+            'language': series.language,
+            'input': series.input,
+            'threads': series.threads,
+            'variant': series.variant,
+            'toolchain': series.toolchain,
+            'build': build,
+            'result': result.dict()
+        })
+
+    def record_series(self, series: SeriesResult, build: str | None = None):
+        self.write({
+            'type': 'series',
+            'bench': series.bench,
+            'language': series.language,
+            'input': series.input,
+            'threads': series.threads,
+            'variant': series.variant,
+            'toolchain': series.toolchain,
+            'build': build,
+            'series': series.dict(exclude={'run_results','warmup_results'})
+        })
+
+    def record_suite(self, suite: int, database: Path | str):
+        self.write({
+            'type': 'suite',
+            'suite': suite,
+            'database': str(Path(database).resolve())
+        })
+
+    def close(self):
+        self.file.close()
+
+def read_journal(path: Path | str, offsets: list[int] | None = None) -> Iterator[tuple[int,dict]]:
+    """
+    Read records (and their offsets) from a journal
+
+    If 'offsets' are given, only the records at those offsets are
+    read. A partly written record at the end is skipped.
+    """
+    with open(path,'rb') as f:
+        positions = iter(offsets) if offsets is not None else None
+
+        while True:
+            if positions is not None:
+                offset = next(positions,None)
+                if offset is None:
+                    break
+                f.seek(offset)
+            else:
+                offset = f.tell()
+
+            line = f.readline()
+            if not line:
+                break
+
+            try:
+                yield (offset,json.loads(line))
+            except json.JSONDecodeError:
+                log.warning(f"Skipping incomplete journal record at {offset}")
+
+def series_key(record: dict) -> tuple[str,float,int | None,str | None,str | None]:
+    return (record['bench'],float(record['input']),record.get('threads'),record.get('variant'),record.get('toolchain'))
+
+def index_journal(path: Path | str) -> dict:
+    """Get the offsets of the records for each series in a journal"""
+    index = {}
+    for offset, record in read_journal(path):
+        # suite records aren't part of any series
+        if record['type'] == 'suite':
+            continue
+        index.setdefault(series_key(record),[]).append(offset)
+    return index
+
+def load_progress(path: Path | str) -> dict:
+    """
+    Get the progress of each series in a journal
+
+    For each series this gives the build hash of its latest records,
+    the offsets of its successful runs by index, and whether the
+    series finished. Records from older builds are ignored.
+    """
+    progress = {}
+
+    for offset, record in read_journal(path):
+        # suite records aren't part of any series
+        if record['type'] == 'suite':
+            continue
+
+        key = series_key(record)
+        entry = progress.get(key)
+
+        # start over if the program was rebuilt since
+        if not entry or entry['build'] != record['build']:
+            entry = progress[key] = {
+                'build': record['build'],
+                'runs': {},
+                'finished': False
+            }
+
+        if record['type'] == 'run' and not record['result']['failed']:
+            entry['runs'][record['result']['index']] = offset
+
+        elif record['type'] == 'series':
+            entry['finished'] = True
+
+    return progress
+
+def journal_suite(path: Path | str, database: Path | str) -> int | None:
+    """Get the suite that a journal was last saved as in a database, if any"""
+    database = str(Path(database).resolve())
+    suite = None
+
+    for _, record in read_journal(path):
+        if record['type'] == 'suite' and record['database'] == database:
+            suite = record['suite']
+
+    return suite
+
+def load_runs(path: Path | str, offsets: list[int]) -> list[RunResult]:
+    return [ RunResult(**r['result']) for _, r in read_journal(path,offsets) ]
+
+def load_series(path: Path | str, offsets: list[int]) -> SeriesResult | None:
+    """
+    Rebuild a series from its journal records
+
+    If the series finished, its summary record is used as is. If it
+    was interrupted, the statistics are calculated from its runs.
+    Only records from the latest build are used, and later runs
+    replace earlier runs with the same index.
+    """
+    summary = None
+    runs = {}
+    warmups = {}
+    first = None
+
+    for _, record in read_journal(path,offsets):
+
+        # start over if the program was rebuilt since
+        if not first or first['build'] != record['build']:
+            summary = None
+            runs = {}
+            warmups = {}
+            first = record
+
+        kind = record['type']
+
+        if kind == 'series':
+            summary = record['series']
+        elif kind == 'warmup':
+            result = RunResult(**record['result'])
+            warmups[result.index] = result
+        elif kind == 'run':
+            result = RunResult(**record['result'])
+            runs[result.index] = result
+
+    if not first:
+        return None
+
+    runs = [ runs[i] for i in sorted(runs) ]
+    warmups = [ warmups[i] for i in sorted(warmups) ]
+
+    # use the summary of a finished series
+    if summary:
+        series = SeriesResult(**summary)
+        series.run_results = runs
+        series.warmup_results = warmups
+        return series
+
+    # recalculate an unfinished series from its runs
+    series = SeriesResult(
+        bench=first['bench'],
+        input=first['input'],
+        language=first['language'],
+        threads=first.get('threads'),
+        variant=first.get('variant'),
+        toolchain=first.get('toolchain'),
+        build=first['build'])
+
+    series.warmup_results = warmups
+
+    for run in runs:
+        series.append_result(run)
+
+    return series
+
+def load_journal(path: Path | str) -> Iterator[SeriesResult]:
+    """Rebuild every series in a journal, one at a time"""
+    for offsets in index_journal(path).values():
+        series = load_series(path,offsets)
+        if series and series.count():
+            yield series
@@ -1,91 +1,302 @@
 import os
-import pickle
 import time
+import select
 import signal
+import hashlib
 import logging
+import tempfile
 import subprocess
 
 from pathlib import Path
-from threading import Thread
-from benchmarks.result import RunResult
+from threading import Thread, Event
+from benchmarks.result import RunResult, BuildResult
+from benchmarks.sample import Sampler, read_ram
+from benchmarks.counters import Counters
+from benchmarks.spawn import spawn
 
 log = logging.getLogger()
 
+# bytes read from the output of a benchmark at once
+CHUNK_SIZE: int = 65536
+
+# seconds to wait for output before checking whether to stop reading
+POLL_INTERVAL: float = 0.1
+
+# seconds to wait for the rest of the output once the benchmark exits
+DRAIN_TIMEOUT: float = 1
+
 class Timeout(Thread):
 
     def __init__(self, pid: int, timeout: int):
         Thread.__init__(self)
-        self.setDaemon(1)
+        self.daemon = True
         self.pid = pid
         self.timeout = timeout
-        self.timedout = False 
+        self.timedout = False
+        self.finished = Event()
 
     def run(self):
-        try: 
-            self.wait()                           
-        except:
-            log.warn("Benchmark timed out")
+        try:
+            self.wait()
+        except OSError:
+            pass
 
     def wait(self):
-        time.sleep(self.timeout)
-        self.timedout = True
-        os.kill(self.pid, signal.SIGKILL)
-
-def measure(index: int, command: list[str], input: float, timeout: int) -> RunResult | None:
-    r, w = os.pipe()
-    pid = os.fork()
-
-    # we are the parent process
-    if pid:
-        # not using write on this side
-        os.close(w)
-        result = None
-
-        # read the result from the pipe
-        with os.fdopen(r,'r') as f:
-            result = RunResult.parse_raw(f.read())
-        
-        # wait for child process to exit
-        os.waitpid(pid,0)
-        return result
+        if not self.finished.wait(self.timeout):
+            log.warning("Benchmark timed out")
+            self.timedout = True
+            os.kill(self.pid, signal.SIGKILL)
 
-    # we are the child process
-    else:
+    def cancel(self):
+        self.finished.set()
+
+class Digest(Thread):
+    """
+    Hashes the output of a benchmark as it's written
 
-        # create a new run result object
-        result = RunResult(index=index,input=input)
+    Output is read in chunks and never kept, so programs with large
+    output don't fill memory or block on a full pipe. Records the
+    time of the first byte (in ns since 'clock') and the total size.
+    Reading can be stopped before the end of the output (see 'stop'),
+    for when something the benchmark started still holds the pipe.
+    """
 
+    def __init__(self, stream, clock: int):
+        Thread.__init__(self)
+        self.daemon = True
+        self.stream = stream
+        self.clock = clock
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.first = None
+        self.stopped = Event()
+
+    def run(self):
+        fd = self.stream.fileno()
         try:
-            timer = Timeout(pid,timeout)
-            timer.start()
+            while not self.stopped.is_set():
+                # wait a little at a time, so that reading can be stopped
+                ready, _, _ = select.select([fd],[],[],POLL_INTERVAL)
+                if not ready:
+                    continue
+
+                chunk = os.read(fd, CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                if self.first is None:
+                    self.first = time.perf_counter_ns() - self.clock
+                self.hash.update(chunk)
+                self.size += len(chunk)
+        except OSError:
+            pass
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+def pin(pid: int, cores: list[int] | None):
+    """Pin a process to 'cores', if given"""
+    if not cores:
+        return
 
-            log.debug("Starting benchmark")
+    try:
+        os.sched_setaffinity(pid,cores)
+    except ProcessLookupError:
+        # the process has already exited
+        pass
+    except OSError as e:
+        log.warning(f"Failed to pin process {pid} to cores {cores}: {e}")
 
-            # start recording benchmark
-            result.start_timer()
-            result.start_cpu_check()
+def measure(index: int, command: list[str], input: float, timeout: int, cwd: Path | None = None, rate: float = 100, limit: int = 1000, counters: list[str] | None = None, env: dict | None = None, spawner: Path | None = None, cores: list[int] | None = None) -> RunResult | None:
+    """
+    Run a command once and measure it
 
+    The command is started through the spawn helper 'spawner' if given
+    (see spawn), so it's a child of the harness forked from a small
+    process, and held before exec until the timer starts. Otherwise
+    it's spawned directly (subprocess uses vfork/exec, so the
+    interpreter isn't copied). Either way the exact child is reaped
+    with wait4. The run time covers the span from the start of the
+    command until the child exits, using the monotonic clock. The
+    timeout is stopped before the child is reaped, so it can never
+    kill a reused pid. While the child runs, its RSS and CPU use are
+    sampled 'rate' times a second (see Sampler).
+
+    If 'cores' is given, only the child is pinned to them, so the
+    threads of the harness that watch it stay where they are. A child
+    started through the helper is pinned before exec, and one spawned
+    directly right after it starts.
+
+    The peak RSS of a child spawned directly starts at the peak RSS of
+    the harness, so it's only kept if it's above that, and otherwise
+    replaced by the sampled peak.
+
+    If 'counters' is given (a list of event names, which may be empty
+    for all of them), performance counters are attached to the child
+    and saved in the result (see Counters).
+
+    Standard output goes through a pipe into a SHA-256 hash (see
+    Digest), which is saved with the output size, the time to the
+    first byte and the output throughput.
+    """
+    result = RunResult(index=index,input=input)
+
+    log.debug("Starting benchmark")
+
+    # start the process through the helper, held before exec
+    spawned = spawn(spawner,command,cwd,env) if spawner else None
+
+    if spawner and not spawned:
+        log.warning("Spawn helper failed, starting benchmark directly")
+
+    # open the counters before the timer starts
+    group = None
+    if counters is not None:
+        group = Counters(counters,spawned[1] if spawned else 0)
+
+    try:
+        # start recording benchmark
+        result.start_timer()
+
+        if spawned:
+            process, pid, start = spawned
+            pin(pid,cores)
+
+            # let the held child run the command
+            try:
+                os.write(start,b'\0')
+            finally:
+                os.close(start)
+
+        else:
             # start the process
             process = subprocess.Popen(
                 command,
-                stdout=subprocess.DEVNULL,
+                cwd=cwd,
+                env=env,
+                stdout=subprocess.PIPE,
                 stderr=subprocess.DEVNULL)
+            pid = process.pid
+            pin(pid,cores)
+
+    except (OSError,ValueError):
+        log.warning(f"Benchmark failed")
+        result.failed = True
+        if group:
+            group.close()
+        if spawned:
+            os.wait4(spawned[1],0)
+            spawned[0].stdout.close()
+        return result
+
+    digest = Digest(process.stdout,result.clock())
+    digest.start()
+
+    timer = Timeout(pid,timeout)
+    timer.start()
+
+    sampler = Sampler(pid,rate,limit)
+    sampler.start()
+
+    try:
+        # wait for this specific child to exit, but leave it to be reaped
+        os.waitid(os.P_PID,pid,os.WEXITED | os.WNOWAIT)
+
+    except KeyboardInterrupt:
+        timer.cancel()
+        os.kill(pid, signal.SIGKILL)
+        os.wait4(pid,0)
+        raise
+
+    # stop recording benchmark
+    result.stop_timer()
+
+    # the pid stays ours until it's reaped, so stop the timer first
+    timer.cancel()
+    timer.join()
+
+    sampler.stop()
+    sampler.read_exit()
+
+    _, status, usage = os.wait4(pid,0)
+
+    result.record_samples(sampler.times,sampler.ram,sampler.cpu,sampler.peak)
+    result.record_threads(sampler.threads)
+
+    # finish reading output (unless something the benchmark started still has the pipe)
+    digest.join(DRAIN_TIMEOUT)
+    complete = not digest.is_alive()
+
+    # only close the pipe once nothing is reading it
+    digest.stop()
+    process.stdout.close()
+
+    # a partial hash can't be verified, so leave it out
+    if complete:
+        result.record_output(digest.hash.hexdigest(),digest.size,digest.first)
+    else:
+        log.warning("Output was still open after the benchmark exited, leaving out its hash")
+
+    # the child has exited, so its counts are final
+    if group:
+        result.counters = group.read()
+        group.close()
+    result.calculate(status,usage)
+
+    # rusage of a child spawned directly starts at the peak of the harness
+    if not spawned and result.max_rss <= read_ram(os.getpid())[1]:
+        result.max_rss = result.peak_rss
+
+    # the child is already reaped, so let Popen know
+    if not spawned:
+        process.returncode = result.exit_code
+
+    if timer.timedout:
+        result.timed_out = True
+        result.failed = True
+
+    elif result.exit_code != 0:
+        log.warning(f"Benchmark exited with code {result.exit_code}")
+        result.failed = True
+
+    log.debug("Finished benchmark")
+
+    return result
+
+def measure_build(command: list[str], cwd: Path, env: dict) -> tuple[BuildResult,str,str]:
+    """
+    Run a build command and measure it
+
+    The command is reaped with wait4, so the CPU time and peak RSS
+    include every step of the build that it waited for (compilers,
+    linkers and so on). Returns the result and the build output.
+    """
+    result = BuildResult()
+
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter_ns()
+
+        process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            env=env,
+            stdout=stdout,
+            stderr=stderr)
+
+        # wait for this specific child to exit
+        _, status, usage = os.wait4(process.pid,0)
+        result.wall_time = time.perf_counter_ns() - start
 
-            # stop recording benchmark
-            result.stop_cpu_check()
-            result.stop_timer()
-            result.calculate()
+        result.calculate(status,usage)
 
-            log.debug("Finished benchmark")
+        # the child is already reaped, so let Popen know
+        process.returncode = result.exit_code
 
-        except KeyboardInterrupt:
-            os.kill(process.pid, signal.SIGKILL)
+        stdout.seek(0)
+        stderr.seek(0)
 
-        except (OSError,ValueError):
-            log.warn(f"Benchmark failed")
-            result.failed = True
+        output = stdout.read().decode(errors='replace')
+        errors = stderr.read().decode(errors='replace')
 
-        finally:
-            with os.fdopen(w,'w') as f:
-                f.write(result.json())
-            os._exit(0)
\ No newline at end of file
+    return (result,output,errors)
@@ -0,0 +1,285 @@
+import json
+import math
+import toml
+import logging
+import argparse
+
+import numpy as np
+
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.table import ResultTable
+from benchmarks.analysis import load_table
+from benchmarks.utilities import setup_logger
+
+log = logging.getLogger()
+
+# log of the growth function of each model, by name. 'power' has a
+# fitted exponent, the others have a fixed shape and only a constant
+MODELS: dict[str,Callable[[np.ndarray],np.ndarray]] = {
+    'power': lambda n: np.log(n),
+    'nlogn': lambda n: np.log(n * np.log(n)),
+    'factorial': lambda n: np.array([ math.lgamma(x + 1) for x in n ])
+}
+
+# run fields that are modelled
+FIELDS: tuple = ('run_time','max_rss')
+
+# fewest distinct inputs needed to fit a program
+MIN_INPUTS: int = 3
+
+def fit_model(name: str, inputs: np.ndarray, values: np.ndarray) -> dict | None:
+    """
+    Fit one model to the values measured at each input
+
+    Models are fitted by least squares in log space, as
+    'log(value) = a + b * log(f(input))'. 'b' is fitted for the power
+    law and fixed at 1 for the other models. Returns the coefficients
+    with the R-squared and adjusted R-squared (both in log space), or
+    None if the model can't be fitted to these inputs.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = MODELS[name](inputs)
+
+    y = np.log(values)
+
+    if not (np.isfinite(x).all() and np.isfinite(y).all()):
+        return None
+
+    if name == 'power':
+        b, a = np.polyfit(x, y, 1)
+        parameters = 1
+    else:
+        b = 1.0
+        a = float(np.mean(y - x))
+        parameters = 0
+
+    residual = np.sum((y - (a + b * x)) ** 2)
+    total = np.sum((y - y.mean()) ** 2)
+
+    r2 = 1 - residual / total if total > 0 else 1.0
+
+    # penalize the fitted exponent so that models can be compared
+    count = len(inputs)
+    adjusted = 1 - (1 - r2) * (count - 1) / (count - parameters - 1)
+
+    return {
+        'a': float(a),
+        'b': float(b),
+        'r2': float(r2),
+        'adjusted_r2': float(adjusted)
+    }
+
+def fit(inputs: np.ndarray, values: np.ndarray, models: list[str] | None = None) -> dict | None:
+    """
+    Fit every model to the values measured at each input
+
+    Returns the fitted models by name, and the name of the 'best'
+    model (by adjusted R-squared), or None if there are too few
+    inputs to fit.
+    """
+    if len(np.unique(inputs)) < MIN_INPUTS:
+        return None
+
+    fits = {}
+    for name in models or MODELS:
+        model = fit_model(name, inputs, values)
+        if model is not None:
+            fits[name] = model
+
+    if not fits:
+        return None
+
+    best = max(fits, key=lambda k: fits[k]['adjusted_r2'])
+
+    return {
+        'best': best,
+        'models': fits
+    }
+
+def predict(fitted: dict, input: float, model: str | None = None) -> float:
+    """Predict the value at an input from a fit (with the best model by default)"""
+    name = model or fitted['best']
+    coefficients = fitted['models'][name]
+
+    x = MODELS[name](np.array([float(input)]))[0]
+
+    return float(math.exp(coefficients['a'] + coefficients['b'] * x))
+
+def fit_programs(table: ResultTable, ladder: dict[str,list], deviation: float = 0.25, models: list[str] | None = None) -> dict[str,dict]:
+    """
+    Fit scaling models to the median run time and peak RSS of each program
+
+    Programs are keyed by name (as in 'nbody-1.c'). Each has the
+    inputs it was measured at, a fit for each field in FIELDS, the
+    power law exponent of its run time, predictions for the inputs in
+    its benchmark's 'ladder' that weren't measured and whether it
+    'deviates': its exponent differs from the median exponent of its
+    benchmark by more than 'deviation'.
+    """
+    # leave out the series of scaling sweeps, flag variants and other toolchains
+    runs = table.select((table['kind'] == 'run') & ~table['failed'] & (table['threads'] == 0)
+        & (table['variant'] == '') & (table['toolchain'] == ''))
+
+    keys = ['benchmark','complexity','language','input']
+    medians = {}
+    for field in FIELDS:
+        groups, values, _ = runs.matrix(keys, field)
+        medians[field] = np.nanmedian(values, axis=1) if len(values) else np.zeros(0)
+
+    # gather the medians of each program by input
+    programs = {}
+    for i in range(len(groups['input'])):
+        benchmark = str(groups['benchmark'][i])
+        name = f"{benchmark}-{groups['complexity'][i]}.{groups['language'][i]}"
+
+        program = programs.setdefault(name,{
+            'benchmark': benchmark,
+            'language': str(groups['language'][i]),
+            'complexity': int(groups['complexity'][i]),
+            'inputs': [],
+            'medians': { field: [] for field in FIELDS }
+        })
+
+        program['inputs'].append(float(groups['input'][i]))
+        for field in FIELDS:
+            program['medians'][field].append(float(medians[field][i]))
+
+    for name, program in list(programs.items()):
+        inputs = np.array(program['inputs'])
+
+        program['fits'] = {
+            field: fit(inputs, np.array(program['medians'][field]), models)
+            for field in FIELDS
+        }
+
+        if program['fits']['run_time'] is None:
+            log.warning(f"Not enough inputs to fit {name}")
+            programs.pop(name)
+            continue
+
+        # the exponent is comparable between programs whatever model is best
+        power = fit_model('power', inputs, np.array(program['medians']['run_time']))
+        program['exponent'] = power['b'] if power else None
+
+        # predict the inputs of the benchmark that weren't measured
+        missing = [ float(v) for v in ladder.get(program['benchmark'],[]) if float(v) not in program['inputs'] ]
+
+        program['predictions'] = {
+            str(input): {
+                field: predict(program['fits'][field], input)
+                for field in FIELDS if program['fits'][field]
+            }
+            for input in missing
+        }
+
+    # compare each program's exponent to the others of its benchmark
+    exponents = {}
+    for program in programs.values():
+        if program['exponent'] is not None:
+            exponents.setdefault(program['benchmark'],[]).append(program['exponent'])
+
+    for program in programs.values():
+        siblings = exponents.get(program['benchmark'],[])
+
+        if program['exponent'] is None or len(siblings) < 2:
+            program['deviates'] = False
+            continue
+
+        median = float(np.median(siblings))
+        program['sibling_exponent'] = median
+        program['deviates'] = bool(abs(program['exponent'] - median) > deviation)
+
+    return programs
+
+def load_models(path: Path | str = 'output/models.json') -> dict[str,dict]:
+    """Load the models saved by the fit command, or nothing if there are none"""
+    try:
+        with open(path,'r') as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+def run():
+    # define and parse command line arguments
+    parser = argparse.ArgumentParser(
+        prog='Fit',
+        description='Fit scaling models to the results of each program',
+        epilog='Leave an issue on the repo if you have trouble')
+
+    parser.add_argument('-c','--config',
+        dest='config',
+        action='store',
+        default='benchmarks.toml',
+        help='Path to a toml config file')
+
+    parser.add_argument('-d','--database',
+        dest='database',
+        action='store',
+        default='output/results.db',
+        help='Path to the results database')
+
+    parser.add_argument('-s','--suite',
+        dest='suite',
+        action='store',
+        default=None,
+        help='The suite to fit (defaults to the latest)')
+
+    parser.add_argument('-o','--output',
+        dest='output',
+        action='store',
+        default='output/models.json',
+        help='Path to write the models to')
+
+    parser.add_argument('-p','--predict',
+        dest='predict',
+        action='store',
+        default=None,
+        help='Comma-separated inputs to predict, besides the unmeasured config values')
+
+    parser.add_argument('-f','--logfile',
+        dest='logfile',
+        action='store',
+        default=None,
+        help='Path to a log file')
+
+    parser.add_argument('-l','--loglevel',
+        dest='loglevel',
+        action='store',
+        default='warn',
+        help='The level to log at')
+
+    args = vars(parser.parse_args())
+
+    # initialize the logger for the application
+    log = setup_logger(args['loglevel'].upper(),args['logfile'])
+
+    # get the benchmark configuration file
+    with open(args['config'], 'r') as f:
+        config = toml.loads(f.read(), _dict=dict)
+
+    settings = config.get('models',{})
+    deviation = float(settings.get('deviation','0.25'))
+    models = settings.get('models',None)
+
+    table = load_table(Path(args['database']),Path('output/results'),args['suite'])
+
+    # predict the config inputs of each benchmark, and any extra ones
+    ladder = { k: list(v) for k, v in config.get('values',{}).items() }
+
+    if args['predict']:
+        extra = [ float(v) for v in args['predict'].split(',') ]
+        ladder = { k: v + extra for k, v in ladder.items() }
+
+    programs = fit_programs(table,ladder,deviation,models)
+    log.info(f"Fitted {len(programs)} programs")
+
+    with open(args['output'],'w') as f:
+        json.dump(programs, f, indent=4)
+
+    for name, program in sorted(programs.items()):
+        best = program['fits']['run_time']['best']
+        r2 = program['fits']['run_time']['models'][best]['r2']
+        flag = '*' if program['deviates'] else ''
+        print(f"{name}\t{best}\t{r2:.3f}\t{program['exponent']:.2f}{flag}")
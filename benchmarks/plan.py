@@ -0,0 +1,296 @@
+import math
+import time
+import logging
+import threading
+
+import numpy as np
+
+from pathlib import Path
+from dataclasses import dataclass
+
+from benchmarks.store import Store
+from benchmarks.table import load_history
+from benchmarks.models import fit, predict
+from benchmarks.schedule import Job, scheduling_cores
+from benchmarks.result import SeriesResult
+
+log = logging.getLogger()
+
+@dataclass
+class Estimate:
+    seconds: float | None  # predicted time of one run
+    source: str            # 'history', 'model', 'fit', 'scaled' or 'none'
+
+@dataclass
+class Slot:
+    job: Job
+    estimate: Estimate
+    timeout: float
+    duration: float | None # predicted time of the whole series
+    start: float
+    finish: float
+    deferred: bool = False
+
+def estimate_key(name: str, threads: int | None, variant: str | None, toolchain: str | None) -> tuple[str,int,str,str]:
+    """Key the estimates of a program by name (as in 'nbody-1.c'), cores in a sweep (or 0), flag variant and toolchain"""
+    return (name, threads or 0, variant or '', toolchain or '')
+
+def load_estimates(database: Path) -> dict[tuple,dict[float,float]]:
+    """
+    Get the median run time (in seconds) of every program and input in the database
+
+    Programs are keyed as in 'estimate_key', then by input. Failed
+    runs and the series of scaling sweeps and other toolchains (whose
+    versions may have changed since) are left out. Returns nothing if there's no database
+    yet.
+    """
+    if not database.exists():
+        return {}
+
+    store = Store(database)
+    history = load_history(store,'run_time')
+    store.close()
+
+    history = history.select(~history['failed'] & (history['threads'] == 0) & (history['toolchain'] == ''))
+
+    groups, values, counts = history.matrix(['benchmark','complexity','language','variant','input'],'run_time')
+
+    if not len(counts):
+        return {}
+
+    medians = np.nanmedian(values, axis=1) * 1e-9
+
+    estimates = {}
+    for i in range(len(counts)):
+        name = f"{groups['benchmark'][i]}-{groups['complexity'][i]}.{groups['language'][i]}"
+        key = estimate_key(name,0,str(groups['variant'][i]),None)
+        estimates.setdefault(key,{})[float(groups['input'][i])] = float(medians[i])
+
+    return estimates
+
+class Planner:
+    """
+    Predicts how long each series will take, and plans them within a budget
+
+    Run times come from earlier suites in the database, or from the
+    saved models (see the fit command), or from the smaller inputs of
+    the same program that have already run. Each run gets a timeout of
+    'factor' times its predicted run time (at least 'minimum' seconds
+    and at most the 'timeout' under 'general'). If a 'budget' (in
+    seconds) is given, series that won't finish in time are deferred.
+    Each series of a scaling sweep has its own estimates, and falls
+    back to the program on one core (the slowest) until it has them.
+    Flag variants and toolchains have their own estimates too, since
+    they may be much slower or faster than the default build.
+    """
+
+    def __init__(self, config: dict, history: dict[tuple,dict[float,float]], models: dict[str,dict], budget: float | None = None):
+        planning = config.get('planning',{})
+        general = config.get('general',{})
+
+        self.config = config
+        self.factor = float(planning.get('factor','10'))
+        self.minimum = float(planning.get('minimum','10'))
+        self.maximum = float(general.get('timeout','3600'))
+        self.budget = budget
+
+        self.measured = { k: dict(v) for k, v in history.items() }
+        self.models = models
+
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+
+    def key(self, job: Job) -> tuple:
+        program = job.program
+        return estimate_key(program.name(),job.threads,program.variant,program.toolchain)
+
+    def estimate(self, key: tuple, input: float) -> Estimate:
+        input = float(input)
+        name, threads, variant, toolchain = key
+
+        with self.lock:
+            measured = dict(self.measured.get(key,{}))
+
+        # use the last measurement of this exact series
+        if input in measured:
+            return Estimate(measured[input],'history')
+
+        # use the saved scaling model of the program (fitted on default builds outside of sweeps)
+        fitted = (self.models.get(name,{}).get('fits') or {}).get('run_time')
+        if fitted and not threads and not variant and not toolchain:
+            return Estimate(predict(fitted,input) * 1e-9,'model')
+
+        inputs = np.array(sorted(measured))
+        values = np.array([ measured[k] for k in inputs ])
+
+        # fit a model to the other inputs of the program
+        if len(inputs) and (fitted := fit(inputs,values)):
+            return Estimate(predict(fitted,input),'fit')
+
+        # extrapolate from one or two inputs with a power law
+        if len(inputs) == 2 and (inputs > 0).all() and (values > 0).all():
+            exponent = math.log(values[1] / values[0]) / math.log(inputs[1] / inputs[0])
+            return Estimate(float(values[1] * (input / inputs[1]) ** exponent),'scaled')
+
+        if len(inputs) == 1 and inputs[0] > 0:
+            return Estimate(float(values[0] * input / inputs[0]),'scaled')
+
+        # fall back to the sweep on one core, then the series outside of sweeps
+        if threads:
+            return self.estimate(estimate_key(name,1 if threads > 1 else 0,variant,toolchain),input)
+
+        return Estimate(None,'none')
+
+    def runs(self, job: Job) -> int:
+        """Get the number of runs (including warmups) a series will make"""
+        config = self.config
+        language = job.program.language()
+
+        adaptive = config.get('adaptive',{})
+        steady = config.get('steady',{})
+
+        if adaptive.get('enabled',False):
+            count = int(adaptive.get('max_runs','30'))
+        else:
+            count = int(config.get('general',{}).get('runs','1'))
+
+        count += int(config.get('warmup',{}).get(language,'0'))
+
+        if steady.get('enabled',False) and language in steady.get('commands',{}):
+            count += int(steady.get('iterations','10'))
+
+        return count
+
+    def duration(self, job: Job, estimate: Estimate) -> float | None:
+        """Get the predicted time of a whole series"""
+        if estimate.seconds is None:
+            return None
+
+        duration = estimate.seconds * self.runs(job)
+
+        # adaptive series stop when their budget is spent
+        adaptive = self.config.get('adaptive',{})
+        if adaptive.get('enabled',False):
+            duration = min(duration, float(adaptive.get('budget','600')) + estimate.seconds)
+
+        return duration
+
+    def remaining(self) -> float | None:
+        if self.budget is None:
+            return None
+        return self.budget - (time.monotonic() - self.start)
+
+    def timeout(self, job: Job) -> float:
+        """Get the timeout of each run in a series"""
+        estimate = self.estimate(self.key(job),job.input)
+
+        if estimate.seconds is None:
+            timeout = self.maximum
+        else:
+            timeout = min(max(estimate.seconds * self.factor, self.minimum), self.maximum)
+
+        # never run past the end of the budget
+        remaining = self.remaining()
+        if remaining is not None:
+            timeout = min(timeout, max(remaining, 1))
+
+        return math.ceil(timeout)
+
+    def fits(self, job: Job) -> bool:
+        """Check that a series is predicted to finish within the budget"""
+        remaining = self.remaining()
+        if remaining is None:
+            return True
+
+        duration = self.duration(job,self.estimate(self.key(job),job.input))
+        return remaining > 0 and (duration is None or duration <= remaining)
+
+    def record(self, series: SeriesResult):
+        """Update the predictions with a finished series"""
+        # only successful runs tell how long a series takes
+        if not series or not any(not r.failed for r in series.run_results):
+            return
+
+        with self.lock:
+            key = estimate_key(series.bench,series.threads,series.variant,series.toolchain)
+            self.measured.setdefault(key,{})[float(series.input)] = series.average_run_time * 1e-9
+
+    def order(self, jobs: list[Job]) -> list[Job]:
+        """
+        Order jobs longest first, for running side by side
+
+        Jobs without a prediction come first, since they could be
+        the longest of all.
+        """
+        def key(job: Job) -> float:
+            duration = self.duration(job,self.estimate(self.key(job),job.input))
+            return math.inf if duration is None else duration
+
+        return sorted(jobs, key=key, reverse=True)
+
+    def schedule(self, jobs: list[Job], concurrent: bool = False) -> list[Slot]:
+        """
+        Simulate running the jobs in order, and defer any that miss the budget
+
+        Running side by side, each job starts when enough cores are free
+        (as with 'run_jobs'). Jobs without a prediction are assumed to
+        take no time, and are never deferred.
+        """
+        cores = len(scheduling_cores(self.config)[1]) if concurrent else 1
+
+        # the time at which each core is next free
+        free = [0.0] * cores
+        slots = []
+
+        # predictions stand in for measurements only while simulating
+        with self.lock:
+            measured = { k: dict(v) for k, v in self.measured.items() }
+
+        for job in jobs:
+            estimate = self.estimate(self.key(job),job.input)
+            duration = self.duration(job,estimate)
+
+            width = max(1,min(job.width,cores)) if concurrent else 1
+            taken = sorted(range(cores), key=lambda c: free[c])[:width]
+
+            start = max(free[c] for c in taken)
+            finish = start + (duration or 0)
+
+            slot = Slot(job,estimate,self.timeout(job),duration,start,finish)
+
+            if self.budget is not None and finish > self.budget:
+                slot.deferred = True
+            else:
+                for c in taken:
+                    free[c] = finish
+
+            slots.append(slot)
+
+            # learn from the prediction, as the real series would
+            if estimate.seconds is not None and estimate.source != 'history':
+                with self.lock:
+                    self.measured.setdefault(self.key(job),{})[float(job.input)] = estimate.seconds
+
+        with self.lock:
+            self.measured = measured
+
+        return slots
+
+def print_plan(slots: list[Slot]):
+    """Print a planned schedule and its total predicted wall time"""
+    def seconds(value: float | None) -> str:
+        return '?' if value is None else f'{value:.2f}'
+
+    print('program\tinput\trun (s)\tsource\ttimeout (s)\tseries (s)\tstart (s)\tstatus')
+
+    for slot in slots:
+        status = 'deferred' if slot.deferred else 'planned'
+        print(f"{slot.job.program.label()}\t{slot.job.input}\t{seconds(slot.estimate.seconds)}\t{slot.estimate.source}\t"
+              f"{slot.timeout:.0f}\t{seconds(slot.duration)}\t{slot.start:.2f}\t{status}")
+
+    planned = [ s for s in slots if not s.deferred ]
+    unknown = [ s for s in planned if s.duration is None ]
+    total = max((s.finish for s in planned), default=0)
+
+    print(f"Planned {len(planned)} of {len(slots)} series, about {total:.1f}s of wall time"
+          + (f" (plus {len(unknown)} without a prediction)" if unknown else ''))
@@ -1,15 +1,25 @@
 from os.path import abspath, basename
 from pathlib import Path
-from benchmarks.result import RunResult, SeriesResult
-from benchmarks.measure import measure
+from typing import Callable
+from benchmarks.result import RunResult, SeriesResult, BuildResult
+from benchmarks.measure import measure, measure_build
+from benchmarks.spawn import build_spawner
+from benchmarks.cache import BuildCache, file_digest, tool_version
+from benchmarks.steady import build_harness, run_harness
+from benchmarks.journal import Journal
+from benchmarks.checksums import expected_checksum
 from benchmarks.utilities import parse_command
 
 import shutil
+import hashlib
 import logging
 import subprocess
 import os
 import toml
 import copy
+import json
+import re
+import time
 
 log = logging.getLogger()
 
@@ -27,14 +37,25 @@ DEFAULTS: dict = {
 
 class Program:
     
-    def __init__(self, path: Path):
+    def __init__(self, path: Path, variant: str | None = None, toolchain: str | None = None):
         self.results = None
         self.original = Path(abspath(path))
         assert(self.original.exists())
 
+        # name of the flag variant (under 'variants') to build with
+        self.variant = variant
+
+        # build tool (under 'toolchains') to use instead of the default
+        self.toolchain = toolchain
+
         self.__stdout = None
         self.__stderr = None
 
+        self.build_hash = None
+        self.build_result = None
+        self.compiler_version = None
+        self.cached = False
+
     def __toml(self, config: dict) -> dict:
         opts, exts = self.__params(config)
 
@@ -64,8 +85,8 @@ class Program:
 
     def __tool(self, config: dict) -> str:
         lang = self.language()
-        tool = config        \
-            .get('tools',{}) \
+        tool = self.toolchain or config \
+            .get('tools',{})            \
             .get(lang,None)
         
         assert tool, f"No tool in config for language \"{lang}\""
@@ -83,17 +104,38 @@ class Program:
         extended = config       \
             .get('options',{}) \
             .get(f"{lang}_ext",'')
+
+        # add the flags of the variant after the others, so they win
+        if self.variant:
+            flags = config            \
+                .get('variants',{})   \
+                .get(lang,{})         \
+                .get(self.variant,'')
+
+            # either a string of build options, or a table of both
+            if isinstance(flags,dict):
+                options = f"{options} {flags.get('options','')}".strip()
+                extended = f"{extended} {flags.get('extended','')}".strip()
+            else:
+                options = f"{options} {flags}".strip()
         
         return (options,extended)
     
     def __runfile(self) -> Path:
         name = ""
         if self.language() == 'java':
-            name = f'{self.target()}.java'
+            name = f'{self.target()}.class'
         else:
             name = f'{self.name()}_run'
         return Path(name)
 
+    def __artifacts(self) -> list[Path]:
+        temp = self.directory()
+        if self.language() == 'java':
+            return sorted(temp.glob('*.class'))
+        else:
+            return [ temp / self.__runfile() ]
+
     def path(self) -> Path:
         return self.original
 
@@ -107,13 +149,95 @@ class Program:
         name = str(self.original.name)
         return name.split('-')[0]
     
-    def build(self, config: dict):
+    def label(self) -> str:
+        label = self.name()
+
+        # keep the directory name free of spaces (as in 'rustc +nightly')
+        if self.toolchain:
+            label += '~' + re.sub(r'[^\w.+-]','',self.toolchain)
+        if self.variant:
+            label += f'@{self.variant}'
+
+        return label
+
+    def directory(self) -> Path:
+        return Path(abspath('tmp')) / self.label()
+
+    def built(self) -> bool:
+        return (self.directory() / self.__runfile()).exists()
+
+    def output(self) -> tuple[str,str]:
+        return (self.__stdout,self.__stderr)
+
+    def fingerprint(self, config: dict) -> str:
+        """
+        Hash everything that determines the build output
+
+        This covers the source file, its toml config, the merged
+        options and tool, the makefile, the tool version and the
+        prebuilt libraries under 'dependencies'.
+        """
+        base = self.original
+        sidecar = base.with_suffix(base.suffix + '.toml')
+
+        makefile = config      \
+            .get('general',{}) \
+            .get('makefile',None)
+
+        tool = self.__tool(config)
+        digest = hashlib.sha256()
+
+        # hash the source and config files
+        for path in (base, sidecar, Path(makefile)):
+            digest.update(str(path.name).encode())
+            if path.exists():
+                digest.update(path.read_bytes())
+
+        # hash the merged options and the build tool
+        cfg = self.__toml(config)
+        settings = {
+            'language': self.language(),
+            'tool': tool,
+            'config': cfg
+        }
+
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        digest.update(tool_version(tool).encode())
+
+        # hash the prebuilt libraries the program links against (each
+        # is only read again once it changes, since programs share them)
+        for path in self.__dependencies(cfg):
+            digest.update(str(path.name).encode())
+            if path.exists():
+                digest.update(file_digest(path).encode())
+
+        return digest.hexdigest()
+
+    def __dependencies(self, cfg: dict) -> list[Path]:
+        deps = cfg.get('dependencies',{})
+        path = deps.get('path',None)
+        files = deps.get('files',[])
+
+        if not path:
+            return []
+
+        # the libraries named in the program's toml file
+        folder = Path(path)
+        paths = [ folder / name for name in files ]
+
+        # libraries that were fetched for the program also pull in the
+        # others they were built with, from the same directory (-L)
+        if deps.get('names',[]) and folder.is_dir():
+            paths += sorted(p for p in folder.iterdir() if p.is_file())
+
+        return paths
+
+    def build(self, config: dict, cache: BuildCache | None = None):
         log.debug(f"Building program {self.name()}")
         
         # get various paths and names for build
-        working = os.getcwd()
         runfile = f'{self.name()}_run'
-        temp = abspath('tmp')
+        temp = self.directory()
         lang = self.language()
 
         # get the makefile specified in config
@@ -131,57 +255,88 @@ class Program:
         tool = self.__tool(config)
         tool_var = f"{lang.upper()}_TOOL"
 
+        # the first line of the version output (as in 'gcc-12 (...) 12.3.0')
+        version = tool_version(tool).splitlines()
+        self.compiler_version = version[0] if version else None
+
         # get the build arguments
         cfg = self.__toml(config)
         opts_var = f"{lang.upper()}_OPTS"
         opts_ext = f"{opts_var}_EXT"
 
-        # delete everything in tmp
-        shutil.rmtree(temp)
+        # delete everything in the build directory
+        shutil.rmtree(temp, ignore_errors=True)
+
+        # create the build directory
+        temp.mkdir(parents=True)
 
-        # create the tmp directory
-        Path(temp).mkdir()
+        # reuse the cached build if nothing has changed
+        self.build_hash = self.fingerprint(config)
+        self.cached = bool(cache and cache.fetch(self.build_hash,temp))
 
-        # copy the input file to tmp
+        if self.cached:
+            log.debug(f"Using cached build of {self.name()}")
+
+            # keep the metrics of the original build
+            metadata = cache.metadata(self.build_hash)
+            self.build_result = BuildResult(**{ **metadata, 'cached': True }) if metadata else None
+            return
+
+        # copy the input file to the build directory
         shutil.copy(self.original,temp)
         shutil.copy(makefile,temp)
 
-        # set the environment variables
-        os.environ[tool_var] = tool
-        os.environ[test_var] = test 
-        os.environ[opts_var] = ' '.join(cfg['options']['initial'])
-        os.environ[opts_ext] = ' '.join(cfg['options']['extended'])
-
-        # change directory to tmp
-        os.chdir(temp)
+        # set the environment variables for this build only
+        env = os.environ.copy()
+        env[tool_var] = tool
+        env[test_var] = test 
+        env[opts_var] = ' '.join(cfg['options']['initial'])
+        env[opts_ext] = ' '.join(cfg['options']['extended'])
 
-        # run make
-        result = subprocess.run([
+        # run make in the build directory
+        result, self.__stdout, self.__stderr = measure_build([
             'make',
             '--makefile',
             basename(makefile),
             runfile
-        ], capture_output=True, text=True)
-
-        self.__stdout = result.stdout
-        self.__stderr = result.stderr
-
-        os.chdir(working)
-
-    def run(self, config: dict, input: int | float, index: int, timeout: int) -> RunResult:
+        ], temp, env)
+
+        if self.built():
+            self.__measure_artifacts(result)
+            self.build_result = result
+
+        # save the build output (and metrics) for later runs
+        if cache and self.built():
+            cache.store(self.build_hash,self.__artifacts(),result.dict())
+
+    def __measure_artifacts(self, result: BuildResult):
+        artifacts = self.__artifacts()
+        result.artifact_size = sum(a.stat().st_size for a in artifacts)
+
+        # get the section sizes of native binaries
+        if self.language() == 'java' or not shutil.which('size'):
+            return
+
+        output = subprocess.run(
+            ['size',str(artifacts[0])],
+            capture_output=True,
+            text=True)
+
+        # the second line is "text data bss dec hex filename"
+        lines = output.stdout.strip().split('\n')
+        if output.returncode == 0 and len(lines) > 1:
+            text, data, bss = lines[1].split()[:3]
+            result.text_size = int(text)
+            result.data_size = int(data)
+            result.bss_size = int(bss)
+
+    def run(self, config: dict, input: int | float, index: int, timeout: int, threads: int | None = None, cores: list[int] | None = None) -> RunResult:
         log.debug(f"Running program {self.name()}")
         result = RunResult(index=index,input=input)
 
         # get various paths and names for build
-        working = os.getcwd()
-        runfile = self.__runfile()
-        temp = abspath('tmp')
-
-        # change directories to tmp
-        os.chdir(temp)
-
-        # convert runfile path to an absolute path
-        runfile = runfile.absolute()
+        temp = self.directory()
+        runfile = temp / self.__runfile()
 
         # if runfile is not found print build output
         if not runfile.exists():
@@ -205,20 +360,184 @@ class Program:
         if not command:
             command = [str(runfile),str(input)]
 
+        # get the sampling settings
+        sampling = config.get('sampling',{})
+        rate = float(sampling.get('rate','100'))
+        limit = int(sampling.get('limit','1000'))
+
+        # get the performance counters to attach, if enabled
+        counters = config.get('counters',{})
+        events = counters.get('events',[]) if counters.get('enabled',False) else None
+
+        # start runs through the spawn helper, built with the C compiler
+        spawner = build_spawner(config.get('tools',{}).get('c','cc'))
+
         log.debug(f"Running: {command}")
-        result = measure(index, command, input, timeout)
+        result = measure(index, command, input, timeout, temp, rate, limit, events, self.__environment(config,threads), spawner, cores)
+
+        # check the output against the reference for the benchmark
+        result.verify_output(expected_checksum(config,self.target(),input))
+
+        if result.wrong_output:
+            log.warning(f"Wrong output from {self.label()} (input={input})")
 
-        os.chdir(working)
         return result
+
+    def __environment(self, config: dict, threads: int | None) -> dict | None:
+        """Get the environment with thread count hints (under 'scaling.env') for a sweep"""
+        if not threads:
+            return None
+
+        env = os.environ.copy()
+        for name, value in config.get('scaling',{}).get('env',{}).items():
+            env[name] = str(value).replace('<THREADS>',str(threads))
+
+        return env
+
+    def steady(self, config: dict, input: int | float, timeout: int, cores: list[int] | None = None) -> list[float]:
+        """
+        Run the program repeatedly inside one process
+
+        Uses the command for the language under 'steady.commands' (which
+        runs a generated harness) and returns the time of each iteration
+        in ns. Returns an empty list if the language isn't supported.
+        """
+        steady = config.get('steady',{})
+        temp = self.directory()
+
+        arguments = {
+            'language': self.language(),
+            'benchmark': self.target(),
+            'binary': str(temp / self.__runfile()),
+            'input': str(input),
+            'iterations': str(steady.get('iterations','10'))
+        }
+
+        # get the steady-state command for the language
+        command = parse_command(steady,arguments)
+
+        if not command:
+            return []
+
+        # build the harness next to the program
+        if not build_harness(self.language(),self.__tool(config),temp):
+            return []
+
+        log.debug(f"Running steady-state: {command}")
+        return run_harness(command,temp,timeout,cores)
     
-    def series(self, config: dict, input: int | float, count: int = 1, timeout: int = 3600) -> SeriesResult:
+    def series(self, config: dict, input: int | float, count: int = 1, timeout: int = 3600, journal: Journal | None = None, previous: list[RunResult] = [], threads: int | None = None, startup: float | None = None, cores: list[int] | None = None) -> SeriesResult:
+        """
+        Run the program repeatedly with one input
+
+        Runs 'count' times, unless 'enabled' is set under 'adaptive'. In
+        that case it runs until the confidence interval of the average
+        run time is narrower than 'precision' (relative to the average),
+        bounded by 'min_runs', 'max_runs' and a 'budget' in seconds.
+
+        Warmup runs for the language (under 'warmup') come first and are
+        kept separately, as are steady-state iterations (under 'steady').
+        Each run is written to the journal, if given, as it finishes.
+        Runs in 'previous' (from a resumed journal) are reused by index
+        instead of being run again. In a scaling sweep, 'threads' is the
+        number of cores the series is pinned to, and is passed to the
+        program as thread count hints (see 'scaling.env'). If the startup
+        time of the language is given (see calibrate), the series also
+        reports its run time without it. Every run is pinned to 'cores',
+        if given (the harness itself isn't).
+        """
+        adaptive = config.get('adaptive',{})
+        steady = config.get('steady',{})
+
         series = SeriesResult(
             bench=self.name(),
             input=input,
-            language=self.language())
+            language=self.language(),
+            build=self.build_hash,
+            build_metrics=self.build_result,
+            cores=cores or sorted(os.sched_getaffinity(0)),
+            threads=threads,
+            variant=self.variant,
+            toolchain=self.toolchain,
+            compiler_version=self.compiler_version,
+            startup_time=startup,
+            confidence_level=float(adaptive.get('confidence','0.95')))
+
+        def run_warmup(index: int) -> RunResult:
+            result = self.run(config,input,index,timeout,threads,cores)
+            series.warmup_results.append(result)
+            if journal:
+                journal.record_run(series,result,'warmup',self.build_hash)
+            return result
+
+        done = { r.index: r for r in previous }
+
+        def run_measured(index: int) -> RunResult:
+            # reuse the run if it was already done
+            if index in done:
+                result = done[index]
+                series.append_result(result)
+                return result
+
+            result = self.run(config,input,index,timeout,threads,cores)
+            series.append_result(result)
+            if journal:
+                journal.record_run(series,result,'run',self.build_hash)
+            return result
+
+        # run warmups that are kept apart from the statistics
+        warmups = int(config.get('warmup',{}).get(self.language(),'0'))
+
+        for i in range(warmups):
+            run_warmup(i)
+
+        # run the steady-state harness if enabled
+        if steady.get('enabled',False):
+            skip = int(steady.get('skip','0'))
+            iterations = int(steady.get('iterations','10'))
+
+            # the timeout is per run, and the harness does every iteration
+            series.set_steady_results(self.steady(config,input,timeout * iterations,cores),skip)
+
+        # run a fixed number of times
+        if not adaptive.get('enabled',False):
+            for i in range(count):
+                run_measured(i)
+
+        # run until the average is known precisely enough
+        else:
+            self.__adaptive(series,adaptive,run_measured)
 
-        for i in range(count):
-            series.append_result(self.run(config,input,i,timeout))
+        if journal:
+            journal.record_series(series,self.build_hash)
 
         return series
-        
\ No newline at end of file
+
+    def __adaptive(self, series: SeriesResult, adaptive: dict, run: Callable[[int],RunResult]):
+        min_runs  = int(adaptive.get('min_runs','3'))
+        max_runs  = int(adaptive.get('max_runs','30'))
+        precision = float(adaptive.get('precision','0.02'))
+        budget    = float(adaptive.get('budget','600'))
+
+        start = time.monotonic()
+        index = 0
+
+        while index < max_runs:
+            result = run(index)
+            index += 1
+
+            # don't repeat runs that failed or timed out
+            if result.failed:
+                break
+
+            if index < min_runs:
+                continue
+
+            # stop once there's an interval, and it's narrow enough
+            interval = series.relative_interval()
+            if interval is not None and interval <= precision:
+                break
+
+            if time.monotonic() - start >= budget:
+                log.info(f"Budget spent for {self.label()} (input={series.input}) after {index} runs")
+                break
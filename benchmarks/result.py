@@ -1,12 +1,17 @@
 import os
 import time
-import psutil
+import resource
 import logging
-from pydantic import BaseModel
+from typing import Iterable
+from pydantic import BaseModel, PrivateAttr
+from benchmarks.stats import Aggregate
 from datetime import datetime
 
 log = logging.getLogger()
 
+# share of the busiest thread's CPU time that counts as useful work
+ACTIVE_SHARE: float = 0.1
+
 class RunResult(BaseModel):
     """The result of a single run with one input"""
 
@@ -21,12 +26,22 @@ class RunResult(BaseModel):
     start_time: int = 0
     stop_time: int = 0
 
-    # ram and cpu load samples
+    # ram (KB) and cpu (cores busy) samples
+    sample_times: list[float] = []  # in s since start
     ram_samples: list[float] = []
     cpu_samples: list[float] = []
+    peak_rss: int = 0               # sampled peak in KB
 
     average_cpu_busy: float = 0.0
 
+    # CPU time over wall time (the average number of cores busy)
+    utilization: float = 0.0
+
+    # CPU time (s) of each thread, busiest first
+    thread_times: list[float] = []
+    active_threads: int = 0        # threads doing useful work
+    thread_imbalance: float = 0.0  # busiest over mean active thread (1 is even)
+
     # resource usage info
     user_cpu_time: float = 0.0  # user CPU time used
     sys_cpu_time: float = 0.0   # system CPU time used
@@ -35,29 +50,78 @@ class RunResult(BaseModel):
     max_rss: int = 0           # maximum resident set size
     exit_code: int = 0         # the process exit code
 
+    minor_faults: int = 0          # page faults without I/O
+    major_faults: int = 0          # page faults with I/O
+    voluntary_switches: int = 0    # context switches while waiting
+    involuntary_switches: int = 0  # context switches by preemption
+
+    # performance counters, by event name
+    counters: dict[str,float] = {}
+
+    # standard output
+    output_hash: str | None = None  # SHA-256 of the output
+    output_size: int = 0            # in bytes
+    first_byte_time: float = 0.0    # in ns since start (0 without output)
+    output_rate: float = 0.0        # in bytes per s
+    wrong_output: bool = False      # output didn't match the reference
+
     # utility flags
     failed: bool = False
+    timed_out: bool = False
+
+    # monotonic clock reading at start
+    _clock: int = PrivateAttr(0)
+
+    def record_samples(self, times: list[float], ram: list[float], cpu: list[float], peak: int):
+        self.sample_times = times
+        self.ram_samples = ram
+        self.cpu_samples = cpu
+        self.peak_rss = peak
+
+    def record_output(self, hash: str, size: int, first: float | None):
+        self.output_hash = hash
+        self.output_size = size
+        self.first_byte_time = first or 0.0
+
+        if self.run_time > 0:
+            self.output_rate = size / self.run_time_s()
+
+    def verify_output(self, expected: str | None):
+        """Fail the run if its output doesn't match the expected hash"""
+        if expected and self.output_hash and self.output_hash != expected:
+            self.wrong_output = True
+            self.failed = True
+
+    def clock(self) -> int:
+        return self._clock
 
-    def start_cpu_check(self):
-        psutil.cpu_percent(percpu=True)
-        psutil.cpu_percent(percpu=True)
+    def record_threads(self, times: dict[int,float]):
+        self.thread_times = sorted(times.values(), reverse=True)
 
-    def stop_cpu_check(self):
-        s = psutil.cpu_percent(percpu=True) 
-        self.cpu_samples = s
+        if not self.thread_times or not self.thread_times[0]:
+            return
+
+        # threads that did a real share of the work
+        busiest = self.thread_times[0]
+        active = [ t for t in self.thread_times if t >= busiest * ACTIVE_SHARE ]
+
+        self.active_threads = len(active)
+        self.thread_imbalance = busiest / (sum(active) / len(active))
 
     def start_timer(self):
         self.start_time = time.time_ns()
+        self._clock = time.perf_counter_ns()
 
     def stop_timer(self):
-        self.stop_time = time.time_ns()
-        self.run_time = self.stop_time - self.start_time
+        elapsed = time.perf_counter_ns() - self._clock
+        self.stop_time = self.start_time + elapsed
+        self.run_time = elapsed
 
     def elapsed(self) -> float:
-        return self.runt_ime_s()
+        return self.run_time_s()
 
     def run_time_s(self) -> float:
-        return self.run_time_ms() / 1000000
+        return self.run_time_ms() / 1000
 
     def run_time_ms(self) -> float:
         return self.run_time_ns() / 1000000
@@ -75,28 +139,76 @@ class RunResult(BaseModel):
         return self.total_cpu_time
 
     def calculate_cpu_load(self):
-        run_time = self.run_time_s()
-        scaled = [run_time*percent/100.0 for percent in self.cpu_samples]
-        self.average_cpu_busy = sum(scaled)
-
-    def calculate_mem_load(self):
-        usage = os.wait3(0)
-        self.user_cpu_time = usage[2][0] # user CPU time used
-        self.sys_cpu_time = usage[2][1]  # system CPU time used
-        self.max_rss = usage[2][2]       # maximum resident set size
-        self.exit_code = usage[1]        # the process error code
+        # average cores busy over the run, scaled to seconds
+        if self.cpu_samples:
+            average = sum(self.cpu_samples) / len(self.cpu_samples)
+            self.average_cpu_busy = average * self.run_time_s()
+
+    def average_ram_load(self) -> float:
+        if self.ram_samples:
+            return sum(self.ram_samples) / len(self.ram_samples)
+        return 0.0
+
+    def calculate_mem_load(self, status: int, usage: resource.struct_rusage):
+        self.user_cpu_time = usage.ru_utime   # user CPU time used
+        self.sys_cpu_time = usage.ru_stime    # system CPU time used
+        self.max_rss = usage.ru_maxrss        # maximum resident set size
+        self.minor_faults = usage.ru_minflt
+        self.major_faults = usage.ru_majflt
+        self.voluntary_switches = usage.ru_nvcsw
+        self.involuntary_switches = usage.ru_nivcsw
+        self.exit_code = os.waitstatus_to_exitcode(status)
         self.total_cpu_time = self.user_cpu_time + self.sys_cpu_time
 
-    def calculate(self):
+    def calculate_utilization(self):
+        # cores busy on average, from the CPU time of the process itself
+        if self.run_time > 0:
+            self.utilization = self.total_cpu_time / self.run_time_s()
+
+    def calculate(self, status: int, usage: resource.struct_rusage):
         self.calculate_cpu_load()
-        self.calculate_mem_load()
+        self.calculate_mem_load(status,usage)
+        self.calculate_utilization()
 
     def __repr__(self) -> str:
-        return f"<RunResult run_time={self.runtime_ms()}>"
+        return f"<RunResult run_time={self.run_time_ms()}>"
     
     def __str__(self) -> str:
         return self.__repr__()
 
+class BuildResult(BaseModel):
+    """The result of building one program"""
+
+    # make timings (including the compiler and linker)
+    wall_time: float = 0.0     # in ns
+    user_cpu_time: float = 0.0 # in s
+    sys_cpu_time: float = 0.0  # in s
+    total_cpu_time: float = 0.0
+
+    max_rss: int = 0           # peak RSS of the largest build step in KB
+    exit_code: int = 0
+
+    # total size of the binary (or of the class files for java)
+    artifact_size: int = 0     # in bytes
+
+    # section sizes of native binaries
+    text_size: int | None = None
+    data_size: int | None = None
+    bss_size: int | None = None
+
+    # whether the build was restored from the cache
+    cached: bool = False
+
+    def wall_time_s(self) -> float:
+        return self.wall_time / 1000000000
+
+    def calculate(self, status: int, usage: resource.struct_rusage):
+        self.user_cpu_time = usage.ru_utime
+        self.sys_cpu_time = usage.ru_stime
+        self.total_cpu_time = self.user_cpu_time + self.sys_cpu_time
+        self.max_rss = usage.ru_maxrss
+        self.exit_code = os.waitstatus_to_exitcode(status)
+
 class SeriesResult(BaseModel):
     """The collected results multiple runs with different inputs"""
 
@@ -106,10 +218,21 @@ class SeriesResult(BaseModel):
 
     complexity: int = 0
 
+    # hash of the build that was run
+    build: str | None = None
+
+    # how long the build took and how big its output is
+    build_metrics: BuildResult | None = None
+
     average_run_time: float = 0.0
     maximum_run_time: float = None
     minimum_run_time: float = None
 
+    # startup time of the language (see calibrate), and the average
+    # run time without it
+    startup_time: float | None = None
+    corrected_run_time: float | None = None
+
     average_cpu_time: float = 0.0
     minimum_cpu_time: float = None
     maximum_cpu_time: float = None
@@ -117,47 +240,114 @@ class SeriesResult(BaseModel):
     average_cpu_busy: int = 0
     average_ram_load: int = 0
 
+    # confidence interval half-width of the average run_time
+    confidence_level: float = 0.95
+    confidence_interval: float | None = None
+
+    # average time of steady-state iterations
+    average_steady_time: float | None = None
+
+    # cores the series was pinned to
+    cores: list[int] = []
+
+    # cores (and thread count hints) given in a scaling sweep
+    threads: int | None = None
+
+    # flag variant the program was built with (under 'variants')
+    variant: str | None = None
+
+    # build tool used instead of the default (under 'toolchains')
+    toolchain: str | None = None
+
+    # first line of the build tool's version output
+    compiler_version: str | None = None
+
     run_results: list[RunResult] = []
 
+    # runs excluded from the statistics
+    warmup_results: list[RunResult] = []
+
+    # iteration times (ns) of steady-state runs
+    steady_results: list[float] = []
+
+    # running statistics of the successful runs
+    _run_time: Aggregate = PrivateAttr(default_factory=Aggregate)
+    _cpu_time: Aggregate = PrivateAttr(default_factory=Aggregate)
+    _ram_load: Aggregate = PrivateAttr(default_factory=Aggregate)
+    _counted: int = PrivateAttr(default=0)
+
     def append_result(self, result: RunResult):
         self.run_results.append(result)
         self.calculate(result)
 
     def calculate(self, result: RunResult):
+        self.calculate_aggregates(result)
         self.calculate_run_time()
+        self.calculate_run_time_interval()
         self.calculate_cpu_usage()
-        # self.calculate_ram_load()
+        self.calculate_ram_load()
         self.calculate_run_time_limits(result)
         self.calculate_cpu_time_limits(result)
         self.complexity = self.bench_complexity()
 
+    def calculate_aggregates(self, result: RunResult):
+        # catch up on runs that were added without append_result
+        if self._counted != self.count() - 1:
+            self._run_time = Aggregate()
+            self._cpu_time = Aggregate()
+            self._ram_load = Aggregate()
+            runs = self.run_results[:-1]
+        else:
+            runs = []
+
+        # failed runs are kept, but left out of the statistics
+        for run in runs + [result]:
+            if not run.failed:
+                self._run_time.add(run.run_time_ns())
+                self._cpu_time.add(run.cpu_time_ns())
+                self._ram_load.add(run.average_ram_load())
+
+        self._counted = self.count()
+
     def calculate_run_time(self):
         # calculate average run_time
-        total = sum(r.run_time_ns() for r in self.run_results)
-        self.average_run_time = total / self.count()
+        self.average_run_time = self._run_time.mean
+
+        # take out the time it takes to start any program in the language
+        if self.startup_time is not None:
+            self.corrected_run_time = max(self.average_run_time - self.startup_time, 0.0)
+
+    def calculate_run_time_interval(self):
+        # calculate the confidence interval of average run_time
+        if self._run_time.count > 1:
+            self.confidence_interval = self._run_time.interval(self.confidence_level)
 
     def calculate_cpu_usage(self):
         # calculate average cpu_load
-        total = sum(r.cpu_time_ns() for r in self.run_results)
-        self.average_cpu_time = total / self.count()
+        self.average_cpu_time = self._cpu_time.mean
+
+    def calculate_ram_load(self):
+        # calculate average ram_load
+        self.average_ram_load = int(self._ram_load.mean)
 
     def calculate_run_time_limits(self, result: RunResult):
-        self.maximum_run_time = max(
-            self.maximum_run_time or 0,
-            result.run_time_ns())
-        
-        self.minimum_run_time = min(
-            self.minimum_run_time or result.run_time_ns(),
-            result.run_time_ns())
+        # leave the limits unset until a run succeeds
+        if self._run_time.count:
+            self.maximum_run_time = self._run_time.maximum
+            self.minimum_run_time = self._run_time.minimum
         
     def calculate_cpu_time_limits(self, result: RunResult):
-        self.maximum_cpu_time = max(
-            self.maximum_cpu_time or 0,
-            result.cpu_time_ns())
-        
-        self.minimum_cpu_time = min(
-            self.minimum_cpu_time or result.cpu_time_ns(),
-            result.cpu_time_ns())
+        if self._cpu_time.count:
+            self.maximum_cpu_time = self._cpu_time.maximum
+            self.minimum_cpu_time = self._cpu_time.minimum
+
+    def set_steady_results(self, results: list[float], skip: int = 0):
+        self.steady_results = results
+
+        # average the iterations after the skipped ones
+        measured = results[skip:]
+        if measured:
+            self.average_steady_time = sum(measured) / len(measured)
 
     def count(self) -> int:
         return len(self.run_results)
@@ -168,6 +358,16 @@ class SeriesResult(BaseModel):
     def bench_complexity(self) -> str | None:
         return self.bench.split('-')[1].split('.')[0]
         
+    def relative_interval(self) -> float | None:
+        if self.confidence_interval is None or not self.average_run_time:
+            return None
+        return self.confidence_interval / self.average_run_time
+
+    def average_steady_time_ms(self) -> float | None:
+        if self.average_steady_time is None:
+            return None
+        return self.average_steady_time / 1000000
+
     def average_run_time_ms(self) -> float:
         return self.average_run_time / 1000000
         
@@ -199,7 +399,7 @@ class SummaryResult(BaseModel):
 
     # add other summary information here
 
-    def build(self, series: list[SeriesResult]):
+    def build(self, series: Iterable[SeriesResult]):
         
         # build summary information here
         
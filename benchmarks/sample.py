@@ -0,0 +1,158 @@
+import os
+import time
+import logging
+
+from threading import Thread, Event
+
+log = logging.getLogger()
+
+CLOCK_TICKS: int = os.sysconf('SC_CLK_TCK')
+
+# seconds between readings of the threads (one file each) of a process
+THREAD_INTERVAL: float = 0.25
+
+def read_cpu(pid: int) -> float:
+    """Get the CPU time (in seconds) used by all threads of a process"""
+    return read_stat(f'/proc/{pid}/stat')
+
+def read_stat(path: str) -> float:
+    """Get the CPU time (in seconds) from a stat file of a process or thread"""
+    with open(path,'r') as f:
+        data = f.read()
+
+    # skip the command name, which may contain spaces
+    fields = data[data.rfind(')') + 2:].split()
+
+    # utime and stime are fields 14 and 15 in proc(5)
+    utime = int(fields[11])
+    stime = int(fields[12])
+
+    return (utime + stime) / CLOCK_TICKS
+
+def read_threads(pid: int) -> dict[int,float]:
+    """Get the CPU time (in seconds) used by each thread of a process"""
+    times = {}
+
+    for tid in os.listdir(f'/proc/{pid}/task'):
+        try:
+            times[int(tid)] = read_stat(f'/proc/{pid}/task/{tid}/stat')
+        except (OSError,ValueError,IndexError):
+            # the thread has exited
+            pass
+
+    return times
+
+def read_ram(pid: int) -> tuple[int,int]:
+    """Get the current and peak resident set size (in KB) of a process"""
+    current = 0
+    peak = 0
+
+    with open(f'/proc/{pid}/status','r') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                current = int(line.split()[1])
+            elif line.startswith('VmHWM:'):
+                peak = int(line.split()[1])
+
+    return (current,peak)
+
+class Sampler(Thread):
+    """
+    Samples the RSS and CPU use of a process while it runs
+
+    Samples are taken 'rate' times a second, at most once per clock
+    tick (since CPU time is counted in ticks), and the first is taken
+    one interval after the start. When more than 'limit' samples have
+    been collected, neighbouring samples are merged and
+    the sampling interval doubles, so long runs stay bounded.
+
+    The CPU time of each thread is read every THREAD_INTERVAL seconds
+    (or with every sample, if they're further apart), and once more
+    when the process exits (see 'read_exit'). The last value seen for
+    each thread is kept in 'threads'.
+    """
+
+    def __init__(self, pid: int, rate: float = 100, limit: int = 1000):
+        Thread.__init__(self)
+        self.daemon = True
+        self.pid = pid
+        self.interval = 1.0 / min(rate,CLOCK_TICKS)
+        self.limit = max(limit,2)
+        self.finished = Event()
+
+        self.times: list[float] = []    # seconds since start
+        self.ram: list[float] = []      # RSS in KB
+        self.cpu: list[float] = []      # cores busy
+        self.peak: int = 0              # peak RSS in KB
+        self.threads: dict[int,float] = {} # CPU seconds by thread id
+
+    def run(self):
+        try:
+            start = time.perf_counter()
+            last_time = start
+            last_cpu = read_cpu(self.pid)
+            last_threads = None
+
+            while not self.finished.wait(self.interval):
+                now = time.perf_counter()
+                cpu = read_cpu(self.pid)
+                ram, peak = read_ram(self.pid)
+
+                # the process has exited but isn't reaped yet
+                if not ram and not peak:
+                    break
+
+                elapsed = now - last_time
+
+                self.times.append(now - start)
+                self.cpu.append((cpu - last_cpu) / elapsed)
+                self.ram.append(ram)
+
+                self.peak = max(self.peak,peak)
+
+                # threads that exit keep their last reading
+                if last_threads is None or now - last_threads >= THREAD_INTERVAL:
+                    self.threads.update(read_threads(self.pid))
+                    last_threads = now
+
+                last_time = now
+                last_cpu = cpu
+
+                if len(self.times) > self.limit:
+                    self.downsample()
+
+        except (OSError,ValueError,IndexError):
+            # the process is gone
+            pass
+
+    def downsample(self):
+        size = len(self.times) // 2 * 2
+
+        # merge each pair of samples into one
+        times = self.times[1:size:2]
+        cpu = [ (a + b) / 2 for a, b in zip(self.cpu[0:size:2], self.cpu[1:size:2]) ]
+        ram = [ max(a,b) for a, b in zip(self.ram[0:size:2], self.ram[1:size:2]) ]
+
+        # keep any unpaired sample at the end
+        self.times = times + self.times[size:]
+        self.cpu = cpu + self.cpu[size:]
+        self.ram = ram + self.ram[size:]
+
+        # sample at half the rate from now on
+        self.interval *= 2
+
+    def read_exit(self):
+        """
+        Read the threads once more, after the process exits but before it's reaped
+
+        Only the main thread is left by then, so this gives its final
+        time; threads that exited earlier keep their last reading.
+        """
+        try:
+            self.threads.update(read_threads(self.pid))
+        except OSError:
+            pass
+
+    def stop(self):
+        self.finished.set()
+        self.join()
@@ -0,0 +1,116 @@
+import os
+import logging
+import threading
+
+from typing import Callable, Any
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.program import Program
+
+log = logging.getLogger()
+
+@dataclass
+class Job:
+    program: Program
+    input: int | float
+    width: int
+    threads: int | None = None  # cores given in a scaling sweep
+
+class CorePool:
+    """Hands out disjoint sets of cores to concurrent series"""
+
+    def __init__(self, cores: list[int]):
+        self.cores = sorted(cores)
+        self.free = sorted(cores)
+        self.condition = threading.Condition()
+
+    def acquire(self, width: int) -> list[int]:
+        # never ask for more cores than exist
+        width = max(1,min(width,len(self.cores)))
+
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.free) >= width)
+
+            # take neighbouring cores where possible
+            taken = self.free[:width]
+            self.free = self.free[width:]
+
+        return taken
+
+    def release(self, cores: list[int]):
+        with self.condition:
+            self.free = sorted(self.free + cores)
+            self.condition.notify_all()
+
+def scheduling_cores(config: dict) -> tuple[list[int],list[int]]:
+    """
+    Get the housekeeping cores and the benchmark cores
+
+    The housekeeping cores are reserved for the harness. The
+    benchmark cores are any cores that are left, unless a list
+    is given with 'cores' under 'scheduling'.
+    """
+    scheduling = config.get('scheduling',{})
+    available = sorted(os.sched_getaffinity(0))
+
+    housekeeping = scheduling.get('housekeeping',[0])
+    cores = scheduling.get('cores',[]) or available
+
+    # keep benchmarks away from the housekeeping cores
+    cores = [ c for c in cores if c in available and c not in housekeeping ]
+    housekeeping = [ c for c in housekeeping if c in available ]
+
+    assert cores, "No cores left for benchmarks after housekeeping"
+
+    return (housekeeping or available, cores)
+
+def scheduling_width(config: dict, program: Program) -> int:
+    scheduling = config.get('scheduling',{})
+    widths = scheduling.get('widths',{})
+    return int(widths.get(program.name(),scheduling.get('width',1)))
+
+def run_pinned(job: Job, function: Callable[[Job,list[int]],Any]) -> Any:
+    """
+    Run a job on the first 'threads' cores of the harness
+
+    Used for scaling sweeps without the scheduler, so that a job
+    still only gets as many cores as it's meant to. Only the
+    programs are pinned (see measure), not the harness.
+    """
+    available = sorted(os.sched_getaffinity(0))
+    taken = available[:job.threads or len(available)]
+
+    return function(job,taken)
+
+def run_jobs(config: dict, jobs: list[Job], function: Callable[[Job,list[int]],Any]) -> list[Any]:
+    """
+    Run each job on its own set of cores
+
+    Jobs run at the same time whenever enough cores are free, and
+    'function' is called with the cores for its job, to pin the
+    programs it runs to (see measure). The harness, including the
+    worker threads and the threads they start, stays on the
+    housekeeping cores until every job is done.
+    """
+    housekeeping, cores = scheduling_cores(config)
+    pool = CorePool(cores)
+
+    log.info(f"Scheduling {len(jobs)} series on cores {cores} (housekeeping {housekeeping})")
+
+    # keep the harness itself on the housekeeping cores
+    original = os.sched_getaffinity(0)
+    os.sched_setaffinity(0,housekeeping)
+
+    def work(job: Job) -> Any:
+        taken = pool.acquire(job.width)
+        try:
+            return function(job,taken)
+        finally:
+            pool.release(taken)
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(cores)) as executor:
+            return list(executor.map(work,jobs))
+    finally:
+        os.sched_setaffinity(0,original)
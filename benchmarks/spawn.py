@@ -0,0 +1,137 @@
+import os
+import shlex
+import logging
+import threading
+import subprocess
+
+from pathlib import Path
+from functools import lru_cache
+
+log = logging.getLogger()
+
+SPAWN_HELPER: str = """\
+#define _GNU_SOURCE
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <unistd.h>
+#include <sys/syscall.h>
+#include <linux/sched.h>
+
+// Generated by benchmarks/spawn.py: starts a benchmark as a child of
+// the harness (CLONE_PARENT) from this small process, so its peak RSS
+// doesn't start at that of the harness. Writes the pid of the child to
+// the first fd, and the child waits for a byte on the second before it
+// runs the command.
+int main(int argc, char **argv) {
+    if (argc < 4)
+        return 2;
+
+    int report = atoi(argv[1]);
+    int start = atoi(argv[2]);
+
+    long pid = syscall(SYS_clone, CLONE_PARENT | SIGCHLD, 0, 0, 0, 0);
+
+    if (pid == 0) {
+        char go;
+        close(report);
+
+        // the harness closes the pipe without a byte if it gives up
+        if (read(start, &go, 1) != 1)
+            _exit(127);
+
+        close(start);
+        execvp(argv[3], argv + 3);
+        _exit(127);
+    }
+
+    if (pid < 0)
+        return 1;
+
+    dprintf(report, "%ld\\n", pid);
+    return 0;
+}
+"""
+
+# directory to build the helper in
+SPAWN_PATH: Path = Path('tmp') / 'spawn'
+
+# series running in parallel build the helper only once
+SPAWN_LOCK = threading.Lock()
+
+def build_spawner(tool: str, path: Path = SPAWN_PATH) -> Path | None:
+    """Write and compile the spawn helper, or None if it can't be built"""
+    with SPAWN_LOCK:
+        return compile_spawner(tool,Path(os.path.abspath(path)))
+
+@lru_cache(maxsize=None)
+def compile_spawner(tool: str, path: Path) -> Path | None:
+    """Compile the spawn helper in 'path', unless it's already there"""
+    binary = path / 'spawn'
+    source = path / 'spawn.c'
+
+    # early return if the helper is already built
+    if binary.exists() and source.exists() and source.read_text() == SPAWN_HELPER:
+        return binary
+
+    path.mkdir(parents=True, exist_ok=True)
+
+    with open(source,'w') as f:
+        f.write(SPAWN_HELPER)
+
+    try:
+        result = subprocess.run(
+            [*shlex.split(tool),'-O2','-o',str(binary),str(source)],
+            capture_output=True,
+            text=True)
+    except OSError as e:
+        log.warning(f"Failed to build spawn helper with {tool}: {e}")
+        return None
+
+    if result.returncode != 0:
+        log.warning(f"Failed to build spawn helper:\n{result.stderr}")
+        return None
+
+    return binary
+
+def spawn(spawner: Path, command: list[str], cwd: Path | None = None, env: dict | None = None) -> tuple[subprocess.Popen,int,int] | None:
+    """
+    Start a command through the spawn helper, paused before exec
+
+    Returns the helper (already reaped, with the output pipe of the
+    command as 'stdout'), the pid of the command, which is a child of
+    the harness, and a fd to write one byte to so it runs. Returns
+    None if the helper failed.
+    """
+    report_r, report_w = os.pipe()
+    start_r, start_w = os.pipe()
+
+    try:
+        helper = subprocess.Popen(
+            [str(spawner),str(report_w),str(start_r),*command],
+            cwd=cwd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            pass_fds=(report_w,start_r))
+    except (OSError,ValueError):
+        for fd in (report_r,report_w,start_r,start_w):
+            os.close(fd)
+        return None
+
+    # only the helper and the paused command keep these
+    os.close(report_w)
+    os.close(start_r)
+
+    # the helper exits as soon as it has written the pid
+    with os.fdopen(report_r,'rb') as f:
+        data = f.read()
+
+    helper.wait()
+
+    if helper.returncode != 0 or not data.strip():
+        os.close(start_w)
+        helper.stdout.close()
+        return None
+
+    return (helper,int(data),start_w)
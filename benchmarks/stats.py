@@ -0,0 +1,66 @@
+import math
+
+from statistics import NormalDist
+
+def t_quantile(p: float, df: int) -> float:
+    """
+    Get the quantile of Student's t distribution
+
+    Exact for one and two degrees of freedom, otherwise uses the
+    Cornish-Fisher expansion around the normal quantile, which is
+    within one percent from three degrees of freedom upwards.
+    """
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+
+    z = NormalDist().inv_cdf(p)
+    n = float(df)
+
+    return z                                                           \
+        + (z**3 + z) / (4 * n)                                         \
+        + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * n**2)                 \
+        + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * n**3)
+
+class Aggregate:
+    """
+    Running statistics of a value, updated in constant time
+
+    Keeps the count, mean, minimum and maximum along with the sum of
+    squared differences from the mean (Welford's method), so that the
+    variance never needs a second pass over the values.
+    """
+
+    __slots__ = ('count','mean','m2','minimum','maximum')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum,value)
+        self.maximum = max(self.maximum,value)
+
+    def variance(self) -> float:
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
+    def stdev(self) -> float:
+        return math.sqrt(self.variance())
+
+    def interval(self, level: float = 0.95) -> float:
+        """Get the half-width of the confidence interval of the mean"""
+        if self.count < 2:
+            return math.inf
+        error = self.stdev() / math.sqrt(self.count)
+        return t_quantile(0.5 + level / 2, self.count - 1) * error
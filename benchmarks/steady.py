@@ -0,0 +1,95 @@
+import logging
+import subprocess
+
+from pathlib import Path
+from benchmarks.measure import pin
+
+log = logging.getLogger()
+
+JAVA_HARNESS: str = """\
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.reflect.Method;
+import java.util.Arrays;
+
+// Generated by benchmarks/steady.py: runs a benchmark's main
+// method repeatedly in one JVM and prints each iteration time (ns)
+public class SteadyHarness {
+    public static void main(String[] args) throws Throwable {
+        Class<?> target = Class.forName(args[0]);
+        int iterations = Integer.parseInt(args[1]);
+        String[] rest = Arrays.copyOfRange(args, 2, args.length);
+
+        Method main = target.getMethod("main", String[].class);
+        main.setAccessible(true);
+
+        PrintStream out = System.out;
+
+        for (int i = 0; i < iterations; i++) {
+            System.setOut(new PrintStream(OutputStream.nullOutputStream()));
+
+            long start = System.nanoTime();
+            main.invoke(null, (Object) rest);
+            long stop = System.nanoTime();
+
+            out.println(stop - start);
+        }
+
+        out.flush();
+    }
+}
+"""
+
+# harness source files for each language
+HARNESSES: dict = {
+    'java': ('SteadyHarness.java', JAVA_HARNESS)
+}
+
+def build_harness(language: str, tool: str, path: Path) -> bool:
+    """Write and compile the steady-state harness in a build directory"""
+    assert language in HARNESSES, f"No steady-state harness for language \"{language}\""
+    name, source = HARNESSES[language]
+
+    # early return if the harness is already built
+    if (path / name).with_suffix('.class').exists():
+        return True
+
+    with open(path / name,'w') as f:
+        f.write(source)
+
+    result = subprocess.run(
+        [tool,'-d','.','-cp','.',name],
+        cwd=path,
+        capture_output=True,
+        text=True)
+
+    if result.returncode != 0:
+        log.warning(f"Failed to build steady-state harness:\n{result.stderr}")
+        return False
+
+    return True
+
+def run_harness(command: list[str], path: Path, timeout: int, cores: list[int] | None = None) -> list[float]:
+    """Run the harness (pinned to 'cores', if given) and get the time (in ns) of each iteration"""
+    process = subprocess.Popen(
+        command,
+        cwd=path,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True)
+
+    pin(process.pid,cores)
+
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        log.warning("Steady-state run timed out")
+        return []
+
+    if process.returncode != 0:
+        log.warning(f"Steady-state run failed:\n{stderr}")
+        return []
+
+    return [ float(line) for line in stdout.split() ]
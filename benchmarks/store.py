@@ -0,0 +1,394 @@
+import sys
+import json
+import sqlite3
+import logging
+import argparse
+import functools
+
+from array import array
+from pathlib import Path
+from typing import Iterator, Iterable
+from datetime import datetime
+
+from benchmarks.result import RunResult, SeriesResult
+from benchmarks.columns import RunColumns
+from benchmarks.utilities import setup_logger, write_collated
+
+log = logging.getLogger()
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS suites (
+    id          INTEGER PRIMARY KEY,
+    timestamp   TEXT NOT NULL,
+    name        TEXT
+);
+
+CREATE TABLE IF NOT EXISTS series (
+    id          INTEGER PRIMARY KEY,
+    suite       INTEGER NOT NULL REFERENCES suites(id) ON DELETE CASCADE,
+    benchmark   TEXT NOT NULL,
+    bench       TEXT NOT NULL,
+    language    TEXT NOT NULL,
+    complexity  INTEGER NOT NULL,
+    input       REAL NOT NULL,
+    build       TEXT,
+    timestamp   INTEGER NOT NULL,
+    data        TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS runs (
+    id            INTEGER PRIMARY KEY,
+    series        INTEGER NOT NULL REFERENCES series(id) ON DELETE CASCADE,
+    kind          TEXT NOT NULL,
+    position      INTEGER NOT NULL,
+    run_time      REAL NOT NULL,
+    start_time    INTEGER NOT NULL,
+    total_cpu_time REAL NOT NULL,
+    max_rss       INTEGER NOT NULL,
+    failed        INTEGER NOT NULL,
+    sample_times  BLOB,
+    ram_samples   BLOB,
+    cpu_samples   BLOB,
+    data          TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS series_benchmark ON series (benchmark, language, complexity, input);
+CREATE INDEX IF NOT EXISTS series_language ON series (language);
+CREATE INDEX IF NOT EXISTS series_complexity ON series (complexity);
+CREATE INDEX IF NOT EXISTS series_input ON series (input);
+CREATE INDEX IF NOT EXISTS series_timestamp ON series (timestamp);
+CREATE INDEX IF NOT EXISTS series_suite ON series (suite);
+CREATE INDEX IF NOT EXISTS runs_series ON runs (series, kind, position);
+CREATE INDEX IF NOT EXISTS runs_start_time ON runs (start_time);
+"""
+
+# sample lists are stored as packed arrays of doubles
+SAMPLES: tuple = ('sample_times','ram_samples','cpu_samples')
+
+def pack(values: list[float]) -> bytes:
+    return array('d',values).tobytes()
+
+def unpack(data: bytes | None) -> list[float]:
+    values = array('d')
+    if data:
+        values.frombytes(data)
+    return values.tolist()
+
+class Store:
+    """
+    An SQLite database of benchmark results
+
+    Results are grouped into suites (one bench run each), series
+    (one program at one input) and runs. Series are indexed by
+    benchmark, language, complexity, input and start time.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add_suite(self, timestamp: datetime, name: str | None = None) -> int:
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO suites (timestamp, name) VALUES (?, ?)',
+                (timestamp.isoformat(), name))
+        return cursor.lastrowid
+
+    def add_series(self, suite: int, series: SeriesResult) -> int:
+        runs = series.run_results + series.warmup_results
+
+        # the series starts with its first run
+        timestamp = min((r.start_time for r in runs), default=0)
+
+        data = series.json(exclude={'run_results','warmup_results'})
+
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO series (suite, benchmark, bench, language, complexity, input, build, timestamp, data) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (suite, series.bench_name(), series.bench, series.language,
+                 int(series.bench_complexity()), series.input, series.build, timestamp, data))
+
+            identifier = cursor.lastrowid
+
+            for kind, results in (('run',series.run_results),('warmup',series.warmup_results)):
+                self.connection.executemany(
+                    'INSERT INTO runs (series, kind, position, run_time, start_time, total_cpu_time, max_rss, failed, '
+                    'sample_times, ram_samples, cpu_samples, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [ (identifier, kind, position, r.run_time, r.start_time, r.total_cpu_time, r.max_rss, r.failed,
+                       pack(r.sample_times), pack(r.ram_samples), pack(r.cpu_samples),
+                       r.json(exclude=set(SAMPLES))) for position, r in enumerate(results) ])
+
+        return identifier
+
+    def suites(self) -> list[tuple[int,datetime,str | None]]:
+        rows = self.connection.execute('SELECT id, timestamp, name FROM suites ORDER BY id')
+        return [ (i, datetime.fromisoformat(t), n) for i, t, n in rows ]
+
+    def latest_suite(self) -> int | None:
+        row = self.connection.execute('SELECT MAX(id) FROM suites').fetchone()
+        return row[0]
+
+    def load_runs(self, series: int, kind: str = 'run') -> list[RunResult]:
+        rows = self.connection.execute(
+            'SELECT data, sample_times, ram_samples, cpu_samples FROM runs '
+            'WHERE series = ? AND kind = ? ORDER BY position',
+            (series, kind))
+
+        results = []
+        for data, times, ram, cpu in rows:
+            result = RunResult.parse_raw(data)
+            result.sample_times = unpack(times)
+            result.ram_samples = unpack(ram)
+            result.cpu_samples = unpack(cpu)
+            results.append(result)
+
+        return results
+
+    def load_columns(self, series: int, kind: str = 'run') -> RunColumns:
+        """Load the runs of a series as columns, without samples"""
+        rows = self.connection.execute(
+            'SELECT data FROM runs WHERE series = ? AND kind = ? ORDER BY position',
+            (series, kind))
+
+        columns = RunColumns()
+        for data, in rows:
+            columns.append(json.loads(data))
+
+        return columns
+
+    def load_series(self, identifier: int, runs: bool = True) -> SeriesResult:
+        row = self.connection.execute('SELECT data FROM series WHERE id = ?', (identifier,)).fetchone()
+        series = SeriesResult.parse_raw(row[0])
+
+        if runs:
+            series.run_results = self.load_runs(identifier,'run')
+            series.warmup_results = self.load_runs(identifier,'warmup')
+
+        return series
+
+    def __filters(self,
+        suite: int | None = None,
+        benchmark: str | None = None,
+        language: str | None = None,
+        complexity: int | None = None,
+        input: float | None = None,
+        since: datetime | None = None) -> tuple[str,list]:
+        # build a where clause for the series table
+        filters = {
+            'series.suite = ?': suite,
+            'series.benchmark = ?': benchmark,
+            'series.language = ?': language,
+            'series.complexity = ?': complexity,
+            'series.input = ?': input,
+            'series.timestamp >= ?': int(since.timestamp() * 1e9) if since else None
+        }
+
+        clauses = [ k for k, v in filters.items() if v is not None ]
+        values = [ v for v in filters.values() if v is not None ]
+
+        if clauses:
+            return (' WHERE ' + ' AND '.join(clauses),values)
+        return ('',values)
+
+    def find_series(self, **filters) -> list[tuple[int,str,int,float]]:
+        """
+        Find series matching all of the given filters
+
+        Filters are 'suite', 'benchmark', 'language', 'complexity',
+        'input' and 'since' (a datetime). Returns (id, benchmark,
+        complexity, input) for each series, ordered by benchmark,
+        input and complexity.
+        """
+        where, values = self.__filters(**filters)
+
+        query = 'SELECT id, benchmark, complexity, input FROM series' + where
+        query += ' ORDER BY benchmark, input, complexity, id'
+
+        return self.connection.execute(query,values).fetchall()
+
+    def history(self, field: str = 'run_time', **filters) -> list[tuple[int,str,str,str,int,float,int,str,str,bool,float]]:
+        """
+        Get one field of every run in the series matching the filters
+
+        Returns (suite, timestamp, benchmark, language, complexity,
+        input, threads, variant, toolchain, failed, value) for each run,
+        ordered by suite. The field and whether the run failed are read
+        from the runs table, and only the thread count (0 outside of scaling sweeps), flag variant and
+        toolchain ('' for the default build) of each series are read
+        from its JSON.
+        """
+        assert field in ('run_time','total_cpu_time','max_rss'), f"Unknown run field \"{field}\""
+
+        where, values = self.__filters(**filters)
+        where += (' AND ' if where else ' WHERE ') + "runs.kind = 'run'"
+
+        query = (
+            f'SELECT series.suite, suites.timestamp, series.benchmark, series.language, '
+            f"series.complexity, series.input, COALESCE(json_extract(series.data,'$.threads'),0), "
+            f"COALESCE(json_extract(series.data,'$.variant'),''), "
+            f"COALESCE(json_extract(series.data,'$.toolchain'),''), "
+            f'runs.failed, runs.{field} FROM runs '
+            'JOIN series ON runs.series = series.id '
+            'JOIN suites ON series.suite = suites.id' + where +
+            ' ORDER BY series.suite')
+
+        return self.connection.execute(query,values).fetchall()
+
+    def series(self, runs: bool = True, **filters) -> Iterator[SeriesResult]:
+        """Load each series matching the filters (see find_series)"""
+        for identifier, *_ in self.find_series(**filters):
+            yield self.load_series(identifier,runs)
+
+    def columns(self, **filters) -> Iterator[tuple[SeriesResult,RunColumns]]:
+        """Load each series matching the filters with its runs as columns"""
+        for identifier, *_ in self.find_series(**filters):
+            yield (self.load_series(identifier,False),self.load_columns(identifier))
+
+    def import_series(self, series: Iterable[SeriesResult], timestamp: datetime, name: str | None = None, suite: int | None = None) -> int:
+        """
+        Import series as a new suite
+
+        If 'suite' is given and exists, its series are replaced instead,
+        as when a resumed journal is saved again.
+        """
+        exists = suite is not None and self.connection.execute(
+            'SELECT 1 FROM suites WHERE id = ?', (suite,)).fetchone()
+
+        if exists:
+            with self.connection:
+                self.connection.execute('DELETE FROM series WHERE suite = ?', (suite,))
+        else:
+            suite = self.add_suite(timestamp,name)
+
+        for item in series:
+            self.add_series(suite,item)
+        return suite
+
+    def import_json(self, path: Path | str, timestamp: datetime, name: str | None = None) -> int:
+        """Import a directory of collated result files as a new suite"""
+        def read(file: Path) -> Iterator[SeriesResult]:
+            with open(file,'r') as f:
+                data = json.load(f)
+
+            for complexities in data.get('inputs',{}).values():
+                for items in complexities.values():
+                    for item in items:
+                        yield SeriesResult(**item)
+
+        suite = self.add_suite(timestamp,name)
+
+        for file in sorted(Path(path).glob('*.json')):
+            log.debug(f"Importing {file}")
+            for item in read(file):
+                self.add_series(suite,item)
+
+        return suite
+
+    def export_json(self, path: Path | str, suite: int):
+        """Export a suite as a directory of collated result files"""
+        benchmarks = {}
+
+        for identifier, benchmark, complexity, input in self.find_series(suite=suite):
+            inputs = benchmarks.setdefault(benchmark,{})
+            complexities = inputs.setdefault(input,{})
+            loaders = complexities.setdefault(str(complexity),[])
+            loaders.append(functools.partial(self.load_series,identifier))
+
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        for benchmark, inputs in benchmarks.items():
+            write_collated(path / f'{benchmark}.json',benchmark,inputs)
+
+def run():
+    # define and parse command line arguments
+    parser = argparse.ArgumentParser(
+        prog='Store',
+        description='Import and export results in the results database',
+        epilog='Leave an issue on the repo if you have trouble')
+
+    parser.add_argument('-d','--database',
+        dest='database',
+        action='store',
+        default='output/results.db',
+        help='Path to the results database')
+
+    parser.add_argument('-i','--import',
+        dest='source',
+        action='store',
+        default=None,
+        help='Import a directory of collated JSON results as a new suite')
+
+    parser.add_argument('-e','--export',
+        dest='target',
+        action='store',
+        default=None,
+        help='Export a suite to a directory of collated JSON results')
+
+    parser.add_argument('-s','--suite',
+        dest='suite',
+        action='store',
+        default=None,
+        help='The suite to export (defaults to the latest)')
+
+    parser.add_argument('--list',
+        dest='list',
+        action='store_true',
+        help='List the suites in the database')
+
+    parser.add_argument('-f','--logfile',
+        dest='logfile',
+        action='store',
+        default=None,
+        help='Path to a log file')
+
+    parser.add_argument('-l','--loglevel',
+        dest='loglevel',
+        action='store',
+        default='warn',
+        help='The level to log at')
+
+    args = vars(parser.parse_args())
+
+    # initialize the logger for the application
+    log = setup_logger(args['loglevel'].upper(),args['logfile'])
+
+    store = Store(args['database'])
+
+    if args['source']:
+        source = Path(args['source'])
+        summary = source.parent / 'summary.json'
+        timestamp = datetime.utcnow()
+
+        # use the time of the original run if there is one
+        if summary.exists():
+            with open(summary,'r') as f:
+                timestamp = datetime.fromisoformat(json.load(f)['datetime'])
+
+        suite = store.import_json(source,timestamp,str(source))
+        log.info(f"Imported {source} as suite {suite}")
+
+    if args['target']:
+        suite = args['suite'] or store.latest_suite()
+
+        # there's nothing to export from an empty database
+        if suite is None:
+            log.error(f"No suites in {args['database']} to export")
+            store.close()
+            sys.exit(1)
+
+        suite = int(suite)
+        store.export_json(args['target'],suite)
+        log.info(f"Exported suite {suite} to {args['target']}")
+
+    if args['list']:
+        for identifier, timestamp, name in store.suites():
+            print(f"{identifier}\t{timestamp.isoformat()}\t{name or ''}")
+
+    store.close()
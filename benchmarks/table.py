@@ -0,0 +1,249 @@
+import orjson
+import logging
+
+import numpy as np
+
+from pathlib import Path
+from typing import Iterator, Sequence
+
+from benchmarks.store import Store
+from benchmarks.columns import COUNTER_FIELDS
+
+log = logging.getLogger()
+
+# run fields copied into the table
+RUN_METRICS: tuple = ('index','run_time','total_cpu_time','max_rss','failed')
+
+# per-run parallelism fields (NaN for runs from before they were recorded)
+THREAD_METRICS: tuple = ('utilization','active_threads','thread_imbalance')
+
+# build metrics broadcast to the rows of a series (NaN if unknown)
+BUILD_METRICS: dict[str,str] = {
+    'build_time': 'wall_time',
+    'build_cpu_time': 'total_cpu_time',
+    'build_rss': 'max_rss',
+    'binary_size': 'artifact_size',
+    'text_size': 'text_size',
+    'data_size': 'data_size',
+    'bss_size': 'bss_size'
+}
+
+# columns that identify a series
+SERIES_KEYS: list[str] = ['benchmark','input','language','complexity','threads','variant','toolchain']
+
+def series_rows(series: dict, kind: str, runs: dict[str,Sequence]) -> dict[str,np.ndarray]:
+    """Build the table rows of one series from columns of run fields"""
+    count = len(runs['index'])
+
+    rows = {
+        'benchmark': np.full(count, series['bench'].split('-')[0]),
+        'language': np.full(count, series['language']),
+        'complexity': np.full(count, int(series['complexity']), dtype=np.int64),
+        'input': np.full(count, float(series['input'])),
+        'threads': np.full(count, int(series.get('threads') or 0), dtype=np.int64),
+        'variant': np.full(count, series.get('variant') or ''),
+        'toolchain': np.full(count, series.get('toolchain') or ''),
+        'compiler_version': np.full(count, series.get('compiler_version') or ''),
+        'kind': np.full(count, kind),
+        'index': np.asarray(runs['index'], dtype=np.int64),
+        'run_time': np.asarray(runs['run_time'], dtype=np.float64),
+        'total_cpu_time': np.asarray(runs['total_cpu_time'], dtype=np.float64),
+        'max_rss': np.asarray(runs['max_rss'], dtype=np.int64),
+        'failed': np.asarray(runs['failed'], dtype=bool)
+    }
+
+    for name in COUNTER_FIELDS + THREAD_METRICS:
+        rows[name] = np.asarray(runs.get(name,np.full(count,np.nan)), dtype=np.float64)
+
+    # the run time without the startup time of the language
+    startup = series.get('startup_time')
+    rows['startup_time'] = np.full(count, np.nan if startup is None else float(startup))
+    rows['corrected_run_time'] = np.maximum(rows['run_time'] - rows['startup_time'], 0)
+
+    build = series.get('build_metrics') or {}
+    for name, field in BUILD_METRICS.items():
+        value = build.get(field)
+        rows[name] = np.full(count, np.nan if value is None else float(value))
+
+    return rows
+
+def steady_rows(series: dict) -> dict[str,np.ndarray]:
+    """Build the table rows of the steady-state iterations of a series"""
+    times = series.get('steady_results') or []
+    count = len(times)
+
+    return series_rows(series,'steady',{
+        'index': np.arange(count),
+        'run_time': times,
+        'total_cpu_time': np.zeros(count),
+        'max_rss': np.zeros(count),
+        'failed': np.zeros(count)
+    })
+
+class ResultTable:
+    """
+    A table of benchmark results with one row per run
+
+    Each column is a numpy array. Rows are identified by benchmark,
+    language, complexity, input, threads (the cores of a scaling sweep,
+    or 0), variant (the flag variant, or '' for the default build),
+    toolchain (the build tool, or '' for the default one), kind ('run'
+    or 'steady') and run index. They hold the compiler version, run
+    time, CPU time, peak RSS, failure flag, utilization and thread
+    breakdown, performance counters (NaN where they weren't counted),
+    the run time without the startup time of the language (NaN if it
+    wasn't calibrated) and the build metrics of the series (see
+    BUILD_METRICS).
+    """
+
+    def __init__(self, columns: dict[str,np.ndarray]):
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns['index'])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def select(self, mask: np.ndarray) -> 'ResultTable':
+        return ResultTable({ k: v[mask] for k, v in self.columns.items() })
+
+    def __groups(self, keys: list[str]) -> tuple[np.ndarray,np.ndarray,np.ndarray]:
+        # combine the codes of each key into a single group code
+        code = np.zeros(len(self), dtype=np.int64)
+        for key in keys:
+            uniques, inverse = np.unique(self.columns[key], return_inverse=True)
+            code = code * len(uniques) + inverse.reshape(-1)
+
+        _, first, inverse, counts = np.unique(code,
+            return_index=True,
+            return_inverse=True,
+            return_counts=True)
+
+        return (first,inverse.reshape(-1),counts)
+
+    def group(self, keys: list[str], value: str) -> dict[str,np.ndarray]:
+        """
+        Get the mean, minimum, maximum and count of a column by group
+
+        Returns a column for each key and statistic, with one row per
+        group, ordered by the keys.
+        """
+        first, inverse, counts = self.__groups(keys)
+        values = self.columns[value].astype(np.float64)
+
+        minimum = np.full(len(counts), np.inf)
+        maximum = np.full(len(counts), -np.inf)
+
+        np.minimum.at(minimum, inverse, values)
+        np.maximum.at(maximum, inverse, values)
+
+        groups = { key: self.columns[key][first] for key in keys }
+        groups['mean'] = np.bincount(inverse, weights=values, minlength=len(counts)) / np.maximum(counts,1)
+        groups['minimum'] = minimum
+        groups['maximum'] = maximum
+        groups['count'] = counts
+
+        return groups
+
+    def matrix(self, keys: list[str], value: str) -> tuple[dict[str,np.ndarray],np.ndarray,np.ndarray]:
+        """
+        Get the values of a column as a matrix with one row per group
+
+        Rows are ordered by the keys, and padded with NaN up to the size
+        of the largest group. Returns the key columns of the groups, the
+        matrix and the number of values in each row.
+        """
+        first, inverse, counts = self.__groups(keys)
+
+        # find the position of each value within its group
+        order = np.argsort(inverse, kind='stable')
+        starts = np.cumsum(counts) - counts
+        position = np.arange(len(order)) - np.repeat(starts,counts)
+
+        values = np.full((len(counts),counts.max(initial=0)), np.nan)
+        values[inverse[order],position] = self.columns[value][order]
+
+        groups = { key: self.columns[key][first] for key in keys }
+
+        return (groups,values,counts)
+
+    @classmethod
+    def concatenate(cls, parts: Iterator[dict[str,np.ndarray]]) -> 'ResultTable':
+        empty = series_rows({'bench':'','language':'','complexity':0,'input':0},'run',
+            { name: [] for name in RUN_METRICS })
+
+        parts = [empty] + list(parts)
+
+        return cls({ name: np.concatenate([ p[name] for p in parts ]) for name in empty })
+
+def read_collated(path: Path) -> Iterator[dict[str,np.ndarray]]:
+    """
+    Read the table rows from a collated result file
+
+    Each file only holds one benchmark, so it's parsed whole (with
+    orjson) and turned into rows one series at a time.
+    """
+    with open(path,'rb') as f:
+        data = orjson.loads(f.read())
+
+    for complexities in data.get('inputs',{}).values():
+        for items in complexities.values():
+            for series in items:
+                runs = series.get('run_results',[])
+
+                columns = { name: [ r.get(name,0) for r in runs ] for name in RUN_METRICS }
+                columns.update({ name: [ r.get(name,np.nan) for r in runs ] for name in THREAD_METRICS })
+
+                # counters are missing from runs without them
+                for name in COUNTER_FIELDS:
+                    columns[name] = [ (r.get('counters') or {}).get(name,np.nan) for r in runs ]
+
+                yield series_rows(series,'run',columns)
+
+                yield steady_rows(series)
+
+def load_results(path: Path | str) -> ResultTable:
+    """Load a directory of collated result files as a table"""
+    def parts() -> Iterator[dict[str,np.ndarray]]:
+        for file in sorted(Path(path).glob('*.json')):
+            log.debug(f"Loading {file}")
+            yield from read_collated(file)
+
+    return ResultTable.concatenate(parts())
+
+def load_store(store: Store, **filters) -> ResultTable:
+    """Load the series matching the filters (see Store.find_series) as a table"""
+    def parts() -> Iterator[dict[str,np.ndarray]]:
+        for series, columns in store.columns(**filters):
+            data = series.dict(exclude={'run_results','warmup_results'})
+            yield series_rows(data,'run',{ name: columns[name] for name in RUN_METRICS + COUNTER_FIELDS + THREAD_METRICS })
+            yield steady_rows(data)
+
+    return ResultTable.concatenate(parts())
+
+def load_history(store: Store, value: str = 'run_time', **filters) -> ResultTable:
+    """
+    Load one field of every run in the database as a table
+
+    The table has the 'suite' and 'timestamp' (of the suite) of each
+    run, as well as the usual series keys, 'kind', 'index' and 'failed'.
+    """
+    rows = store.history(value,**filters)
+    suite, timestamp, benchmark, language, complexity, input, threads, variant, toolchain, failed, values = zip(*rows) if rows else ([],) * 11
+
+    return ResultTable({
+        'suite': np.array(suite, dtype=np.int64),
+        'timestamp': np.array(timestamp, dtype=str),
+        'benchmark': np.array(benchmark, dtype=str),
+        'language': np.array(language, dtype=str),
+        'complexity': np.array(complexity, dtype=np.int64),
+        'input': np.array(input, dtype=np.float64),
+        'threads': np.array(threads, dtype=np.int64),
+        'variant': np.array(variant, dtype=str),
+        'toolchain': np.array(toolchain, dtype=str),
+        'kind': np.full(len(rows), 'run'),
+        'index': np.zeros(len(rows), dtype=np.int64),
+        'failed': np.array(failed, dtype=bool),
+        value: np.array(values, dtype=np.float64)
+    })
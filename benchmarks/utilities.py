@@ -1,11 +1,13 @@
-import os, logging
+import os, json, shutil, logging
 from pathlib import Path
+from typing import Callable
 
 ROOT: Path = Path(__file__).parent.resolve()
 
 DEFAULT_DEP_PATH:  Path = ROOT / '../data/dependencies/'
 DEFAULT_PROG_PATH: Path = ROOT / '../programs/'
 DEFAULT_OUT_PATH:  Path = ROOT / '../output/'
+DEFAULT_CACHE_PATH: Path = ROOT / '../data/cache/'
 
 def parse_command(config: dict, arguments: dict) -> list[str]:
     command = []
@@ -17,6 +19,7 @@ def parse_command(config: dict, arguments: dict) -> list[str]:
                 '<LANGUAGE>': arguments.get('language',''),
                 '<BINARY>': arguments.get('binary',''),
                 '<INPUT>': arguments.get('input',''),
+                '<ITERATIONS>': arguments.get('iterations',''),
             }.get(item,item))
     return command
 
@@ -66,6 +69,9 @@ def clear_programs(path: Path = DEFAULT_PROG_PATH):
 def clear_output(path: Path = DEFAULT_OUT_PATH):
     clear(path, keep=[ 'dependencies.list' ])
 
+def clear_cache(path: Path = DEFAULT_CACHE_PATH):
+    shutil.rmtree(path, ignore_errors=True)
+
 def read_list(path: Path | str) -> list[str]:
     path = Path(path)
     result = []
@@ -100,4 +106,33 @@ def write_list(path: Path | str, data: list[str]):
     # write the list to the path
     with open(path,'w') as f:
         for item in data:
-            f.write(f"{str(item)}\n")
\ No newline at end of file
+            f.write(f"{str(item)}\n")
+
+def write_collated(path: Path | str, name: str, inputs: dict[float,dict[str,list[Callable]]]):
+    """
+    Write a collated result file for one benchmark
+
+    The layout is {name, inputs: {input: {complexity: [series]}}},
+    where each series is produced by calling a loader just before
+    it's written, so only one series is in memory at a time.
+    """
+    with open(path,'w') as f:
+        f.write(f'{{"name": {json.dumps(name)}, "inputs": {{')
+
+        for i, input in enumerate(sorted(inputs)):
+            f.write(', ' if i else '')
+            f.write(f'{json.dumps(str(float(input)))}: {{')
+
+            for j, (complexity, loaders) in enumerate(inputs[input].items()):
+                f.write(', ' if j else '')
+                f.write(f'{json.dumps(str(complexity))}: [')
+
+                for k, load in enumerate(loaders):
+                    f.write(', ' if k else '')
+                    f.write(load().json())
+
+                f.write(']')
+
+            f.write('}')
+
+        f.write('}}')
@@ -0,0 +1,9 @@
+/* Startup calibration: prints a line and exits */
+
+#include <stdio.h>
+
+int main(int argc, char **argv)
+{
+    puts("hello world");
+    return 0;
+}
@@ -0,0 +1,9 @@
+// Startup calibration: prints a line and exits
+
+#include <iostream>
+
+int main(int argc, char **argv)
+{
+    std::cout << "hello world" << std::endl;
+    return 0;
+}
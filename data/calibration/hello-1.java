@@ -0,0 +1,7 @@
+// Startup calibration: prints a line and exits
+
+public final class hello {
+    public static void main(String[] args) {
+        System.out.println("hello world");
+    }
+}